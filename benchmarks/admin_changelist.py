@@ -0,0 +1,141 @@
+"""Время ответа списка постов в админке: прежняя настройка PostAdmin
+против текущей на больших данных.
+
+    python -m benchmarks.admin_changelist
+    python -m benchmarks.admin_changelist --posts 100000 --repeat 5
+
+Данные создаёт команда seed в тестовой базе в памяти; миллион постов
+готовится несколько минут.
+"""
+import argparse
+import statistics
+import sys
+import time
+from io import StringIO
+
+from .common import setup_django
+
+
+def legacy_admin_class():
+    """PostAdmin в прежнем виде: <select> всех групп в каждой строке,
+    точные COUNT(*) и без date_hierarchy."""
+    from django.core.paginator import Paginator
+    from posts.admin import PostAdmin
+
+    class LegacyPostAdmin(PostAdmin):
+        list_select_related = False
+        raw_id_fields = ()
+        date_hierarchy = None
+        paginator = Paginator
+        show_full_result_count = True
+
+    return LegacyPostAdmin
+
+
+def scenarios():
+    from datetime import timedelta
+
+    from posts.admin import PostAdmin
+    from posts.models import Post
+    newest = Post.objects.latest('pub_date').pub_date
+    word = Post.objects.earliest('pk').text.split()[0]
+    # Страница 50 или последняя, если постов меньше: номер за концом
+    # списка changelist отвечает редиректом.
+    last_page = (Post.objects.count() - 1) // PostAdmin.list_per_page
+    page = min(49, last_page)
+    return {
+        'первая страница': {},
+        f'страница {page + 1}': {'p': page},
+        'поиск': {'q': word},
+        'год': {'pub_date__year': newest.year},
+        'последние 7 дней': {
+            'pub_date__gte': (newest - timedelta(days=7)).isoformat(),
+        },
+    }
+
+
+def make_request(user, params):
+    from django.contrib.messages.storage.fallback import FallbackStorage
+    from django.test import RequestFactory
+    request = RequestFactory().get('/admin/posts/post/', params)
+    request.user = user
+    request.session = {}
+    request._messages = FallbackStorage(request)
+    return request
+
+
+def measure(model_admin, user, params, repeat):
+    """Медиана времени ответа, мс, и число SQL-запросов."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    times = []
+    for _ in range(repeat + 1):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            model_admin.changelist_view(make_request(user, params)).render()
+            times.append(time.perf_counter() - start)
+    # Первый проход прогревает кеши и не учитывается.
+    return statistics.median(times[1:]) * 1000, len(queries)
+
+
+def run(options):
+    from django.contrib import admin
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    from posts.admin import PostAdmin
+    from posts.models import Post
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+    start = time.monotonic()
+    call_command(
+        'seed', posts=options.posts, groups=options.groups,
+        users=options.users, stdout=StringIO(),
+    )
+    print(f'Данные: {options.posts} постов, {options.groups} групп '
+          f'за {time.monotonic() - start:.0f} с')
+    user = get_user_model().objects.create_superuser(
+        'bench', 'bench@example.com', 'bench'
+    )
+    admins = {
+        'прежний': legacy_admin_class()(Post, admin.site),
+        'текущий': PostAdmin(Post, admin.site),
+    }
+    return {
+        name: {
+            label: measure(model_admin, user, params, options.repeat)
+            for label, model_admin in admins.items()
+        }
+        for name, params in scenarios().items()
+    }
+
+
+def print_results(results):
+    print(f'{"сценарий":<20}{"прежний мс":>12}{"запросов":>10}'
+          f'{"текущий мс":>12}{"запросов":>10}')
+    for name, measured in results.items():
+        legacy_ms, legacy_queries = measured['прежний']
+        current_ms, current_queries = measured['текущий']
+        print(f'{name:<20}{legacy_ms:>12.1f}{legacy_queries:>10}'
+              f'{current_ms:>12.1f}{current_queries:>10}')
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--groups', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=3)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    setup_django()
+    print_results(run(options))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,448 @@
+"""Нагрузочный тест: yatube.wsgi.application в отдельном процессе и
+виртуальные пользователи в потоках.
+
+Запуск из корня репозитория на заполненной базе (manage.py seed):
+
+    python -m benchmarks.loadtest --users 20 --duration 60
+    python -m benchmarks.loadtest --save-baseline
+
+Печатает пропускную способность и p50/p95/p99 по именам маршрутов и
+сравнивает их с сохранённым baseline; при регрессии код выхода 1.
+"""
+import argparse
+import math
+import multiprocessing
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from itertools import accumulate
+
+import requests
+
+from .common import (ROOT, dump_json, git_revision, load_json, percentile,
+                     setup_django)
+
+DEFAULT_BASELINE = ROOT / 'benchmarks' / 'baselines' / 'loadtest.json'
+ACCOUNT_PREFIX = 'loadtest_'
+PASSWORD = 'loadtest-password'
+SAMPLE_SIZE = 200
+REQUEST_TIMEOUT = 30
+# Разница меньше этой не считается регрессией: шум на быстрых страницах.
+MIN_REGRESSION_MS = 2
+
+# Относительная частота обращений к маршрутам. Каждый маршрут из
+# posts.urls, about.urls и users.urls должен быть здесь.
+ROUTE_WEIGHTS = {
+    'posts:main': 30,
+    'posts:group': 15,
+    'posts:profile': 15,
+    'posts:post_detail': 15,
+    'posts:search': 5,
+    'posts:follow_index': 4,
+    'posts:profile_follow': 2,
+    'posts:profile_unfollow': 2,
+    'posts:post_create': 4,
+    'posts:post_edit': 2,
+    'posts:export_posts': 1,
+    'about:author': 1,
+    'about:tech': 1,
+    'users:login': 1,
+    'users:logout': 1,
+    'users:signup': 1,
+    'users:password_change': 1,
+    'users:password_change_done': 1,
+    'users:password_reset': 1,
+    'users:password_reset_done': 1,
+    'users:password_reset_confirm': 1,
+    'users:password_reset_complete': 1,
+}
+
+
+def route_names():
+    from about import urls as about_urls
+    from posts import urls as posts_urls
+    from users import urls as users_urls
+    return {
+        f'{module.app_name}:{pattern.name}'
+        for module in (posts_urls, about_urls, users_urls)
+        for pattern in module.urlpatterns
+    }
+
+
+def check_routes():
+    missing = route_names() - ROUTE_WEIGHTS.keys()
+    if missing:
+        sys.exit(f'Нет веса для маршрутов: {", ".join(sorted(missing))}')
+
+
+def serve(port_queue):
+    """Процесс сервера: отдельный от клиентов, чтобы не делить с ними GIL."""
+    setup_django()
+    from django.core.servers.basehttp import (ThreadedWSGIServer,
+                                              WSGIRequestHandler)
+    from yatube.wsgi import application
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler)
+    server.set_app(application)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def start_server():
+    context = multiprocessing.get_context('spawn')
+    port_queue = context.Queue()
+    process = context.Process(target=serve, args=(port_queue,), daemon=True)
+    process.start()
+    return process, f'http://127.0.0.1:{port_queue.get(timeout=60)}'
+
+
+class Dataset:
+    """Выборка слагов, авторов и постов из базы и учётные записи для входа."""
+
+    def __init__(self, accounts):
+        from posts.models import AuthorStats, Group, Post
+        from posts.utils import POSTS_PER_PAGE
+
+        def pages(count):
+            return max(math.ceil(count / POSTS_PER_PAGE), 1)
+
+        self.index_pages = pages(Post.objects.count())
+        self.group_pages = {
+            slug: pages(count) for slug, count in Group.objects.values_list(
+                'slug', 'posts_count'
+            )[:SAMPLE_SIZE]
+        }
+        self.author_pages = {
+            username: pages(count)
+            for username, count in AuthorStats.objects.order_by(
+                '-posts_count'
+            ).values_list('user__username', 'posts_count')[:SAMPLE_SIZE]
+        }
+        self.post_ids = self.sample_post_ids(Post)
+        self.words = sorted({
+            word for text in Post.objects.filter(
+                pk__in=self.post_ids
+            ).values_list('text', flat=True)
+            for word in text.split() if len(word) > 3
+        }) or ['пост']
+        self.accounts = self.prepare_accounts(accounts, Post)
+
+    @staticmethod
+    def sample_post_ids(post_model):
+        """Случайные существующие pk без ORDER BY RANDOM() по всей таблице."""
+        last = post_model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first()
+        if last is None:
+            sys.exit('База пуста: заполните её командой manage.py seed')
+        rng = random.Random(0)
+        candidates = {rng.randint(1, last) for _ in range(SAMPLE_SIZE * 2)}
+        return sorted(post_model.objects.filter(
+            pk__in=candidates
+        ).values_list('pk', flat=True)) or [last]
+
+    @staticmethod
+    def prepare_accounts(count, post_model):
+        """Пользователи loadtest_N с общим паролем и хотя бы одним постом."""
+        from django.contrib.auth import get_user_model
+        from django.contrib.auth.hashers import make_password
+        User = get_user_model()
+        names = [f'{ACCOUNT_PREFIX}{i}' for i in range(count)]
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            (User(username=name, password=password) for name in names),
+            ignore_conflicts=True,
+        )
+        User.objects.filter(username__in=names).update(password=password)
+        accounts = {}
+        for user in User.objects.filter(username__in=names):
+            posts = list(post_model.objects.filter(
+                author=user
+            ).values_list('pk', flat=True)[:SAMPLE_SIZE])
+            if not posts:
+                posts = [post_model.objects.create(
+                    author=user, text='Пост для нагрузочного теста'
+                ).pk]
+            accounts[user.username] = posts
+        return accounts
+
+
+class VirtualUser(threading.Thread):
+    """Пользователь в замкнутом цикле: запрос, пауза, следующий запрос."""
+
+    def __init__(self, number, base_url, dataset, options, account):
+        super().__init__(daemon=True)
+        self.rng = random.Random(options.seed * 1000 + number)
+        self.base_url = base_url
+        self.dataset = dataset
+        self.options = options
+        self.account = account
+        self.session = requests.Session()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.measure_from = self.deadline = 0
+        self.names = list(ROUTE_WEIGHTS)
+        self.weights = list(accumulate(ROUTE_WEIGHTS.values()))
+
+    def run(self):
+        if self.account:
+            self.login()
+        while time.monotonic() < self.deadline:
+            name = self.rng.choices(self.names, cum_weights=self.weights)[0]
+            self.send(name, **self.build(name))
+            if name == 'users:logout' and self.account:
+                self.login()
+            if self.options.think_time:
+                time.sleep(self.rng.expovariate(1 / self.options.think_time))
+
+    def send(self, name, method, path, params=None, data=None):
+        if data is not None:
+            data['csrfmiddlewaretoken'] = self.session.cookies.get(
+                'csrftoken', ''
+            )
+        start = time.monotonic()
+        try:
+            response = self.session.request(
+                method, self.base_url + path, params=params, data=data,
+                allow_redirects=False, timeout=REQUEST_TIMEOUT,
+            )
+            failed = response.status_code >= 400
+        except requests.RequestException:
+            failed = True
+        if start < self.measure_from:
+            return
+        self.latencies[name].append(time.monotonic() - start)
+        if failed:
+            self.errors[name] += 1
+
+    def login(self):
+        self.send('users:login', **self.get('users:login'))
+        self.send('users:login', **self.post(
+            'users:login', username=self.account, password=PASSWORD
+        ))
+
+    def get(self, name, kwargs=None, **params):
+        from django.urls import reverse
+        return {
+            'method': 'GET',
+            'path': reverse(name, kwargs=kwargs),
+            'params': params or None,
+        }
+
+    def post(self, name, kwargs=None, **data):
+        request = self.get(name, kwargs)
+        request.update(method='POST', data=data)
+        return request
+
+    def page(self, pages):
+        if self.rng.random() < self.options.deep_share:
+            return self.rng.randint(1, pages)
+        return self.rng.randint(1, min(pages, 3))
+
+    def choice(self, mapping):
+        return self.rng.choice(list(mapping))
+
+    def build(self, name):
+        builder = getattr(self, 'build_' + name.split(':')[1], None)
+        if builder is None:
+            return self.get(name)
+        return builder(name)
+
+    def build_main(self, name):
+        return self.get(name, page=self.page(self.dataset.index_pages))
+
+    def build_group(self, name):
+        if not self.dataset.group_pages:
+            return self.get('posts:main')
+        slug = self.choice(self.dataset.group_pages)
+        return self.get(
+            name, {'slug': slug},
+            page=self.page(self.dataset.group_pages[slug]),
+        )
+
+    def build_profile(self, name):
+        username = self.choice(self.dataset.author_pages)
+        return self.get(
+            name, {'username': username},
+            page=self.page(self.dataset.author_pages[username]),
+        )
+
+    def build_profile_follow(self, name):
+        return self.get(
+            name, {'username': self.choice(self.dataset.author_pages)}
+        )
+
+    build_profile_unfollow = build_profile_follow
+
+    def build_post_detail(self, name):
+        return self.get(
+            name, {'post_id': self.rng.choice(self.dataset.post_ids)}
+        )
+
+    def build_search(self, name):
+        return self.get(name, q=self.rng.choice(self.dataset.words))
+
+    def build_post_create(self, name):
+        if self.account and self.rng.random() < self.options.create_share:
+            words = self.rng.choices(self.dataset.words, k=10)
+            return self.post(name, text=' '.join(words))
+        return self.get(name)
+
+    def build_post_edit(self, name):
+        posts = self.dataset.accounts.get(self.account, self.dataset.post_ids)
+        return self.get(name, {'post_id': self.rng.choice(posts)})
+
+    def build_password_reset_confirm(self, name):
+        return self.get(name, {'uidb64': 'MQ', 'token': 'set-password'})
+
+
+def run(options, dataset, base_url):
+    accounts = list(dataset.accounts)
+    users = [
+        VirtualUser(
+            number, base_url, dataset, options,
+            accounts[number % len(accounts)]
+            if number < options.users * options.auth_share else None,
+        )
+        for number in range(options.users)
+    ]
+    start = time.monotonic()
+    for user in users:
+        user.measure_from = start + options.warmup
+        user.deadline = user.measure_from + options.duration
+        user.start()
+    for user in users:
+        user.join()
+    return make_report(options, users)
+
+
+def make_report(options, users):
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    for user in users:
+        for name, values in user.latencies.items():
+            latencies[name].extend(values)
+            errors[name] += user.errors[name]
+    routes = {}
+    for name in sorted(latencies):
+        values = sorted(latencies[name])
+        routes[name] = {
+            'requests': len(values),
+            'errors': errors[name],
+            'rps': round(len(values) / options.duration, 2),
+            **{
+                f'p{p}': round(percentile(values, p) * 1000, 2)
+                for p in (50, 95, 99)
+            },
+        }
+    total = sum(route['requests'] for route in routes.values())
+    return {
+        'revision': git_revision(),
+        'options': {
+            key: getattr(options, key) for key in (
+                'users', 'duration', 'auth_share', 'deep_share',
+                'create_share', 'think_time', 'seed',
+            )
+        },
+        'throughput': round(total / options.duration, 2),
+        'routes': routes,
+    }
+
+
+def print_report(report):
+    print(f'{"маршрут":<32}{"запр.":>8}{"ошиб.":>7}{"rps":>9}'
+          f'{"p50 мс":>10}{"p95 мс":>10}{"p99 мс":>10}')
+    for name, route in report['routes'].items():
+        print(f'{name:<32}{route["requests"]:>8}{route["errors"]:>7}'
+              f'{route["rps"]:>9}{route["p50"]:>10}{route["p95"]:>10}'
+              f'{route["p99"]:>10}')
+    print(f'Всего: {report["throughput"]} запросов/с, '
+          f'ревизия {report["revision"]}')
+
+
+def compare(report, baseline, tolerance):
+    """Список регрессий p95 по маршрутам и общей пропускной способности."""
+    regressions = []
+    for name, route in report['routes'].items():
+        base = baseline['routes'].get(name)
+        if base is None:
+            continue
+        limit = base['p95'] * (1 + tolerance)
+        if route['p95'] > limit and route['p95'] - base['p95'] > (
+            MIN_REGRESSION_MS
+        ):
+            regressions.append(
+                f'{name}: p95 {route["p95"]} мс, было {base["p95"]} мс'
+            )
+    if report['throughput'] < baseline['throughput'] * (1 - tolerance):
+        regressions.append(
+            f'пропускная способность {report["throughput"]} запросов/с, '
+            f'было {baseline["throughput"]}'
+        )
+    return regressions
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--users', type=int, default=10,
+                        help='число виртуальных пользователей')
+    parser.add_argument('--duration', type=float, default=30,
+                        help='длительность замера, секунд')
+    parser.add_argument('--warmup', type=float, default=5,
+                        help='прогрев без записи результатов, секунд')
+    parser.add_argument('--auth-share', type=float, default=0.3,
+                        help='доля пользователей, вошедших на сайт')
+    parser.add_argument('--deep-share', type=float, default=0.2,
+                        help='доля запросов к случайной глубокой странице')
+    parser.add_argument('--create-share', type=float, default=0.5,
+                        help='доля обращений к post_create с отправкой формы')
+    parser.add_argument('--think-time', type=float, default=0,
+                        help='средняя пауза между запросами, секунд')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--url', help='адрес уже запущенного сервера')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='допустимое ухудшение относительно baseline')
+    parser.add_argument('--output', help='файл для JSON с результатами')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    setup_django()
+    check_routes()
+    dataset = Dataset(max(math.ceil(options.users * options.auth_share), 1))
+    server, base_url = None, options.url
+    if base_url is None:
+        server, base_url = start_server()
+    try:
+        report = run(options, dataset, base_url.rstrip('/'))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+    print_report(report)
+    if options.output:
+        dump_json(report, options.output)
+    if options.save_baseline:
+        dump_json(report, options.baseline)
+        return 0
+    try:
+        baseline = load_json(options.baseline)
+    except FileNotFoundError:
+        return 0
+    regressions = compare(report, baseline, options.tolerance)
+    for regression in regressions:
+        print(f'Регрессия: {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
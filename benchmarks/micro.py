@@ -0,0 +1,208 @@
+"""Микробенчмарки отдельных частей запроса: шаблон, пагинация, форма,
+контекст-процессор. Работают на тестовой базе в памяти.
+
+    python -m benchmarks.micro
+    python -m benchmarks.micro --filter paginate --compare a1fbdaa
+
+Результаты сохраняются в benchmarks/results/micro/<ревизия>.json, чтобы
+сравнивать коммиты между собой.
+"""
+import argparse
+import platform
+import statistics
+import sys
+import timeit
+
+from .common import ROOT, dump_json, git_revision, load_json, setup_django
+
+RESULTS_DIR = ROOT / 'benchmarks' / 'results' / 'micro'
+GROUPS_COUNT = 1000
+POSTS_COUNT = 2000
+REPEAT = 5
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Регистрирует фабрику: она готовит данные и возвращает замеряемую
+    функцию без аргументов."""
+    def register(factory):
+        BENCHMARKS[name] = factory
+        return factory
+    return register
+
+
+def make_request(path='/', **params):
+    from django.contrib.auth.models import AnonymousUser
+    from django.test import RequestFactory
+    request = RequestFactory().get(path, params)
+    request.user = AnonymousUser()
+    request.session = {}
+    return request
+
+
+def create_data():
+    from datetime import timedelta
+
+    from django.contrib.auth import get_user_model
+    from django.utils import timezone
+    from posts.bulk import bulk_create_posts, finish_bulk_load
+    from posts.models import Group, Post
+    User = get_user_model()
+    author = User.objects.create_user(username='bench')
+    Group.objects.bulk_create(
+        Group(title=f'Группа {i}', slug=f'group-{i}', description='')
+        for i in range(GROUPS_COUNT)
+    )
+    group_ids = list(Group.objects.values_list('pk', flat=True))
+    now = timezone.now()
+    bulk_create_posts(
+        Post(
+            text=f'Тестовый пост {i} ' * 10,
+            pub_date=now - timedelta(minutes=i),
+            author=author,
+            group_id=group_ids[i % len(group_ids)],
+        )
+        for i in range(POSTS_COUNT)
+    )
+    finish_bulk_load()
+
+
+@benchmark('render_index')
+def render_index():
+    from django.template.loader import render_to_string
+    from posts.models import Post
+    from posts.utils import paginate_page
+    request = make_request()
+    page_obj = paginate_page(request, Post.objects.feed())
+    page_obj.object_list = list(page_obj.object_list)
+    return lambda: render_to_string(
+        'posts/index.html', {'page_obj': page_obj}, request
+    )
+
+
+def paginate(depth):
+    from posts.models import Post
+    from posts.utils import paginate_page
+
+    def run():
+        page_obj = paginate_page(
+            make_request(page=depth), Post.objects.feed()
+        )
+        return list(page_obj.object_list)
+    return run
+
+
+for depth in (1, 10, 100):
+    benchmark(f'paginate_page_{depth}')(lambda depth=depth: paginate(depth))
+
+
+@benchmark('paginate_cursor_100')
+def paginate_cursor():
+    from posts.models import Post
+    from posts.utils import POSTS_PER_PAGE, encode_cursor, paginate_page
+    post = Post.objects.feed()[POSTS_PER_PAGE * 99 - 1]
+    cursor = encode_cursor(post)
+
+    def run():
+        page_obj = paginate_page(
+            make_request(after=cursor), Post.objects.feed()
+        )
+        return list(page_obj.object_list)
+    return run
+
+
+@benchmark('post_form_validate')
+def post_form_validate():
+    from posts.forms import PostForm
+    from posts.models import Group
+    group = Group.objects.last()
+    return lambda: PostForm(
+        data={'text': 'Текст поста', 'group': group.pk}
+    ).is_valid()
+
+
+@benchmark('post_form_render')
+def post_form_render():
+    from posts.forms import PostForm
+    return lambda: str(PostForm())
+
+
+@benchmark('context_processor_year')
+def context_processor_year():
+    from core.context_processors.year import year
+    request = make_request()
+    return lambda: year(request)
+
+
+def measure(function):
+    """Лучшее и медианное время одного вызова, секунд."""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    times = [total / number for total in timer.repeat(REPEAT, number)]
+    return {
+        'number': number,
+        'min': min(times),
+        'median': statistics.median(times),
+    }
+
+
+def run(names):
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+    create_data()
+    return {name: measure(BENCHMARKS[name]()) for name in names}
+
+
+def print_results(results, previous):
+    print(f'{"бенчмарк":<26}{"мин. мкс":>12}{"медиана мкс":>14}{"было":>12}')
+    for name, result in results.items():
+        before = previous.get(name)
+        change = ''
+        if before:
+            change = f'{result["median"] / before["median"] - 1:+.0%}'
+        print(f'{name:<26}{result["min"] * 1e6:>12.1f}'
+              f'{result["median"] * 1e6:>14.1f}{change:>12}')
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--filter', default='',
+                        help='запускать только бенчмарки с этой подстрокой')
+    parser.add_argument('--compare', help='ревизия для сравнения')
+    parser.add_argument('--no-save', action='store_true')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    setup_django()
+    names = [name for name in BENCHMARKS if options.filter in name]
+    if not names:
+        sys.exit(f'Нет бенчмарков с подстрокой {options.filter!r}')
+    results = run(names)
+    previous = {}
+    if options.compare:
+        previous = load_json(
+            RESULTS_DIR / f'{options.compare}.json'
+        )['benchmarks']
+    print_results(results, previous)
+    if options.no_save:
+        return 0
+    import django
+    path = RESULTS_DIR / f'{git_revision()}.json'
+    stored = load_json(path)['benchmarks'] if path.exists() else {}
+    dump_json({
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'benchmarks': {**stored, **results},
+    }, path)
+    print(f'Сохранено: {path}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""Конкурентные чтения и записи SQLite: режим по умолчанию против
+SQLITE_PRAGMAS из настроек.
+
+    python -m benchmarks.sqlite_concurrency
+    python -m benchmarks.sqlite_concurrency --readers 8 --writers 4
+
+Каждый поток держит своё соединение к временному файлу базы, как воркер
+сервера. Ошибка «database is locked» считается, операция не повторяется.
+"""
+import argparse
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from .common import percentile, setup_django
+
+# Поведение SQLite без настройки: журнал отката, fsync на каждую
+# транзакцию, блокировка сразу оборачивается ошибкой.
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+    'busy_timeout': 0,
+}
+INITIAL_ROWS = 10000
+
+
+def prepare(path, pragmas):
+    from core.sqlite import apply_pragmas
+    connection = sqlite3.connect(path, isolation_level=None)
+    apply_pragmas(connection.cursor(), pragmas)
+    connection.execute(
+        'CREATE TABLE IF NOT EXISTS post ('
+        'id INTEGER PRIMARY KEY, author_id INTEGER, text TEXT, '
+        'pub_date REAL)'
+    )
+    connection.execute('CREATE INDEX IF NOT EXISTS post_author '
+                       'ON post (author_id, pub_date)')
+    connection.executemany(
+        'INSERT INTO post (author_id, text, pub_date) VALUES (?, ?, ?)',
+        ((i % 100, f'Пост {i} ' * 20, i) for i in range(INITIAL_ROWS)),
+    )
+    return connection
+
+
+def read(connection, number):
+    connection.execute(
+        'SELECT id, text FROM post WHERE author_id = ? '
+        'ORDER BY pub_date DESC LIMIT 10', (number % 100,),
+    ).fetchall()
+
+
+def write(connection, number):
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        connection.execute(
+            'INSERT INTO post (author_id, text, pub_date) VALUES (?, ?, ?)',
+            (number % 100, f'Новый пост {number}', time.time()),
+        )
+        connection.execute('COMMIT')
+    except sqlite3.Error:
+        connection.execute('ROLLBACK')
+        raise
+
+
+class Worker(threading.Thread):
+    def __init__(self, path, pragmas, operation, deadline):
+        super().__init__(daemon=True)
+        self.path = path
+        self.pragmas = pragmas
+        self.operation = operation
+        self.deadline = deadline
+        self.latencies = []
+        self.locked = 0
+
+    def run(self):
+        from core.sqlite import apply_pragmas
+        connection = sqlite3.connect(
+            self.path, isolation_level=None, check_same_thread=False
+        )
+        apply_pragmas(connection.cursor(), self.pragmas)
+        number = 0
+        while time.monotonic() < self.deadline:
+            number += 1
+            start = time.monotonic()
+            try:
+                self.operation(connection, number)
+            except sqlite3.OperationalError as error:
+                if 'locked' not in str(error):
+                    raise
+                self.locked += 1
+                continue
+            self.latencies.append(time.monotonic() - start)
+        connection.close()
+
+
+def summarize(workers, duration):
+    latencies = sorted(
+        latency for worker in workers for latency in worker.latencies
+    )
+    return {
+        'ops': len(latencies) / duration,
+        'p95': percentile(latencies, 95),
+        'locked': sum(worker.locked for worker in workers),
+    }
+
+
+def run_mode(pragmas, options):
+    with tempfile.TemporaryDirectory() as directory:
+        path = str(Path(directory) / 'bench.sqlite3')
+        prepare(path, pragmas).close()
+        deadline = time.monotonic() + options.duration
+        readers = [
+            Worker(path, pragmas, read, deadline)
+            for _ in range(options.readers)
+        ]
+        writers = [
+            Worker(path, pragmas, write, deadline)
+            for _ in range(options.writers)
+        ]
+        for worker in readers + writers:
+            worker.start()
+        for worker in readers + writers:
+            worker.join()
+        return {
+            'read': summarize(readers, options.duration),
+            'write': summarize(writers, options.duration),
+        }
+
+
+def print_results(results):
+    print(f'{"режим":<12}{"операция":<10}{"оп/с":>10}'
+          f'{"p95 мс":>10}{"locked":>10}')
+    for mode, operations in results.items():
+        for operation, result in operations.items():
+            print(f'{mode:<12}{operation:<10}{result["ops"]:>10.0f}'
+                  f'{result["p95"] * 1000:>10.2f}{result["locked"]:>10}')
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=5,
+                        help='длительность каждого режима, секунд')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    setup_django()
+    from django.conf import settings
+    results = {
+        'default': run_mode(DEFAULT_PRAGMAS, options),
+        'settings': run_mode(settings.SQLITE_PRAGMAS, options),
+    }
+    print_results(results)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+from datetime import datetime
+
+from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.db.models import Avg, Count, Max, Sum
+from django.http import FileResponse, Http404
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from .models import RequestProfile, SlowQuery
+from .profiling import get_profile_path, list_profiles, profile_stats
+
+
+def admin_page(model_admin, request, template, **context):
+    """Своя страница раздела админки с общим контекстом сайта."""
+    return TemplateResponse(request, template, {
+        **model_admin.admin_site.each_context(request),
+        'opts': model_admin.model._meta,
+        **context,
+    })
+
+
+class RequestProfileAdmin(admin.ModelAdmin):
+    """Список файлов профилей вместо changelist по таблице."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path(
+                '<str:name>/download/',
+                self.admin_site.admin_view(self.download_view),
+                name='%s_%s_download' % info,
+            ),
+            path(
+                '<str:name>/stats/',
+                self.admin_site.admin_view(self.stats_view),
+                name='%s_%s_stats' % info,
+            ),
+        ] + super().get_urls()
+
+    def get_profile_path(self, request, name):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        profile_path = get_profile_path(name)
+        if profile_path is None:
+            raise Http404
+        return profile_path
+
+    def changelist_view(self, request, extra_context=None):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        profiles = []
+        for profile_path in list_profiles():
+            stat = profile_path.stat()
+            profiles.append({
+                'name': profile_path.name,
+                'size': stat.st_size,
+                'modified': datetime.fromtimestamp(stat.st_mtime),
+            })
+        return admin_page(
+            self, request, 'admin/core/requestprofile/change_list.html',
+            title='Профили запросов', profiles=profiles,
+        )
+
+    def stats_view(self, request, name):
+        profile_path = self.get_profile_path(request, name)
+        return admin_page(
+            self, request, 'admin/core/requestprofile/stats.html',
+            title=name, name=name, stats=profile_stats(profile_path),
+        )
+
+    def download_view(self, request, name):
+        profile_path = self.get_profile_path(request, name)
+        return FileResponse(
+            open(profile_path, 'rb'), as_attachment=True, filename=name
+        )
+
+
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = (
+        'created',
+        'duration',
+        'view',
+        'template',
+        'short_sql',
+    )
+    list_filter = ('view', )
+    search_fields = ('sql', )
+    empty_value_display = '-пусто-'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def short_sql(self, obj):
+        return obj.sql[:120]
+    short_sql.short_description = 'SQL'
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path(
+                'summary/',
+                self.admin_site.admin_view(self.summary_view),
+                name='%s_%s_summary' % info,
+            ),
+        ] + super().get_urls()
+
+    def summary_view(self, request):
+        """Записи журнала, сгруппированные по форме запроса."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        shapes = SlowQuery.objects.values('fingerprint').annotate(
+            count=Count('id'),
+            total=Sum('duration'),
+            average=Avg('duration'),
+            longest=Max('duration'),
+            normalized=Max('normalized'),
+            views=Count('view', distinct=True),
+        ).order_by('-total')
+        return admin_page(
+            self, request, 'admin/core/slowquery/summary.html',
+            title='Медленные запросы по формам', shapes=shapes,
+        )
+
+
+admin.site.register(RequestProfile, RequestProfileAdmin)
+admin.site.register(SlowQuery, SlowQueryAdmin)
@@ -1,5 +1,11 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+    verbose_name = 'Служебное'
+
+    def ready(self):
+        from .sqlite import configure_sqlite
+        connection_created.connect(configure_sqlite)
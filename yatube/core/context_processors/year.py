@@ -2,9 +2,6 @@ from datetime import datetime
 
 
 def year(request):
-    a = datetime.now()
-    a = int(a.strftime('%Y'))
-    print(a)
     return {
-        'year': a,
+        'year': datetime.now().year,
     }
@@ -0,0 +1,109 @@
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PRIMARY_COOKIE = 'use_primary'
+# Сессии и пользователи всегда читаются из основной базы: вход или выход,
+# не дошедший до реплики, не должен выкидывать пользователя из сессии.
+PRIMARY_APPS = ('auth', 'sessions')
+
+# Куда читать в текущем потоке. Вне запроса (команды, фоновые потоки)
+# состояния нет и все запросы идут в основную базу.
+_state = threading.local()
+
+
+def reads_from_replica():
+    """Разрешено ли текущему запросу читать с реплик."""
+    return (
+        getattr(_state, 'use_replica', False)
+        and bool(settings.DATABASE_REPLICAS)
+    )
+
+
+def choose_replica():
+    """Реплика текущего запроса.
+
+    Выбирается один раз на запрос: реплики отстают по-разному, и чтения
+    одной страницы с разных реплик могли бы не сойтись между собой.
+    """
+    alias = getattr(_state, 'replica', None)
+    if alias is None:
+        alias = _state.replica = _pick_replica()
+    return alias
+
+
+def _pick_replica():
+    alias = random.choice(settings.DATABASE_REPLICAS)
+    # В тестах реплика — зеркало основной базы (TEST MIRROR): это та же
+    # база, и читать её надо через основное соединение.
+    name = connections[alias].settings_dict['NAME']
+    if name == connections[DEFAULT_DB_ALIAS].settings_dict['NAME']:
+        return DEFAULT_DB_ALIAS
+    return alias
+
+
+class ReplicaRouter:
+    """Чтение с реплик там, где его разрешил ReplicaMiddleware; запись и
+    остальные чтения — в основную базу."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        if reads_from_replica():
+            return choose_replica()
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему копированием основной базы.
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaMiddleware:
+    """Разрешает чтение с реплик для view из REPLICA_READ_VIEWS.
+
+    После любой записи пользователь получает cookie use_primary на
+    REPLICA_STICKY_SECONDS и всё это время читает из основной базы:
+    автор сразу видит свой пост, даже если реплика отстаёт.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.use_replica = False
+        _state.replica = None
+        _state.wrote = False
+        try:
+            response = self.get_response(request)
+            wrote = _state.wrote
+        finally:
+            _state.use_replica = False
+            _state.replica = None
+            _state.wrote = False
+        if wrote:
+            response.set_cookie(
+                PRIMARY_COOKIE, '1', max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_name = request.resolver_match.view_name
+        _state.use_replica = (
+            request.method in SAFE_METHODS
+            and PRIMARY_COOKIE not in request.COOKIES
+            and view_name in settings.REPLICA_READ_VIEWS
+        )
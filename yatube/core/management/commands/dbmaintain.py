@@ -0,0 +1,105 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+STEPS = ('analyze', 'vacuum', 'checkpoint')
+CHECKPOINT_MODES = ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE')
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def file_size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+class Command(BaseCommand):
+    help = (
+        'Обслуживание SQLite: ANALYZE, инкрементальный VACUUM и checkpoint '
+        'WAL, с размерами файлов и временем каждого шага'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'steps', nargs='*',
+            help=f'шаги по порядку из {", ".join(STEPS)}; по умолчанию все',
+        )
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--vacuum-pages', type=int, default=0,
+            help='сколько свободных страниц вернуть; 0 — все',
+        )
+        parser.add_argument(
+            '--checkpoint-mode', choices=CHECKPOINT_MODES, default='TRUNCATE',
+        )
+        parser.add_argument(
+            '--enable-incremental', action='store_true',
+            help='включить auto_vacuum=INCREMENTAL (полный VACUUM, один раз)',
+        )
+
+    def handle(self, *args, **options):
+        self.connection = connections[options['database']]
+        if self.connection.vendor != 'sqlite':
+            raise CommandError('dbmaintain работает только с SQLite')
+        unknown = set(options['steps']) - set(STEPS)
+        if unknown:
+            raise CommandError(f'Неизвестные шаги: {", ".join(unknown)}')
+        self.path = self.connection.settings_dict['NAME']
+        self.options = options
+        self.report('до')
+        if options['enable_incremental']:
+            self.timed('auto_vacuum=INCREMENTAL', self.enable_incremental)
+        for step in options['steps'] or STEPS:
+            self.timed(step, getattr(self, step))
+        self.report('после')
+
+    def pragma(self, sql):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {sql}')
+            return cursor.fetchone()
+
+    def timed(self, name, step):
+        start = time.monotonic()
+        result = step()
+        self.stdout.write(
+            f'{name}: {time.monotonic() - start:.2f} с'
+            + (f', {result}' if result else '')
+        )
+
+    def report(self, when):
+        self.stdout.write(
+            f'Размер {when}: база {file_size(self.path)} байт, '
+            f'WAL {file_size(self.path + "-wal")} байт, '
+            f'свободных страниц {self.pragma("freelist_count")[0]}'
+        )
+
+    def analyze(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def enable_incremental(self):
+        self.pragma('auto_vacuum = INCREMENTAL')
+        with self.connection.cursor() as cursor:
+            cursor.execute('VACUUM')
+
+    def vacuum(self):
+        if self.pragma('auto_vacuum')[0] != AUTO_VACUUM_INCREMENTAL:
+            return 'пропущен: нужен --enable-incremental'
+        pages = self.options['vacuum_pages']
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'PRAGMA incremental_vacuum({pages})' if pages
+                else 'PRAGMA incremental_vacuum'
+            )
+            cursor.fetchall()
+        return None
+
+    def checkpoint(self):
+        busy, log, checkpointed = self.pragma(
+            f'wal_checkpoint({self.options["checkpoint_mode"]})'
+        )
+        if log < 0:
+            return 'пропущен: база не в режиме WAL'
+        return f'страниц в WAL {log}, перенесено {checkpointed}' + (
+            ', checkpoint не завершён: база занята' if busy else ''
+        )
@@ -0,0 +1,298 @@
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates, Template
+
+from .query_budget import QueryRecorder
+
+REQUEST_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf')
+)
+
+METRICS = {
+    'yatube_requests_total': (
+        'counter', 'Запросы по view, методу и коду ответа'
+    ),
+    'yatube_request_duration_seconds': (
+        'histogram', 'Время ответа по view'
+    ),
+    'yatube_sql_queries_total': (
+        'counter', 'SQL-запросы по view'
+    ),
+    'yatube_sql_duration_seconds_total': (
+        'counter', 'Время SQL-запросов по view'
+    ),
+    'yatube_template_render_seconds_total': (
+        'counter', 'Время отрисовки шаблонов по view'
+    ),
+    'yatube_cache_requests_total': (
+        'counter', 'Обращения к кешу: попадания и промахи'
+    ),
+}
+
+# Счётчики завершившихся процессов, слитые из их файлов <pid>.json
+TOTALS_FILE = 'totals.json'
+LOCK_FILE = '.lock'
+
+_local = threading.local()
+
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+class Registry:
+    """Счётчики процесса, периодически сбрасываемые в файл <pid>.json.
+
+    Каждый процесс пишет только свой файл; /metrics суммирует все файлы
+    каталога METRICS_DIR, поэтому счётчики видны со всех воркеров. Файлы
+    завершившихся процессов новый процесс сливает в totals.json.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.values = defaultdict(float)
+        self.flushed_at = 0
+        self.merged = False
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if self.pid != os.getpid():
+                # Воркер форкнут после импорта: значения родителя не наши.
+                self.reset()
+            self.values[key] += amount
+
+    def observe(self, name, labels, value, buckets=REQUEST_BUCKETS):
+        for bound in buckets:
+            if value <= bound:
+                self.inc(
+                    f'{name}_bucket', {**labels, 'le': _format_bound(bound)}
+                )
+        self.inc(f'{name}_sum', labels, value)
+        self.inc(f'{name}_count', labels)
+
+    def path(self):
+        return Path(settings.METRICS_DIR) / f'{self.pid}.json'
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        interval = settings.METRICS_FLUSH_INTERVAL
+        if not force and now - self.flushed_at < interval:
+            return
+        with self.lock:
+            self.flushed_at = now
+            samples = [
+                [name, labels, value]
+                for (name, labels), value in self.values.items()
+            ]
+        path = self.path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if not self.merged:
+            # Файл с нашим pid остался от прежнего процесса с тем же pid.
+            merge_stale(path.parent, self.pid)
+            self.merged = True
+        _write_samples(path, samples)
+
+
+def _write_samples(path, samples):
+    temporary = path.with_suffix(f'.{threading.get_ident()}.tmp')
+    temporary.write_text(json.dumps(samples))
+    os.replace(temporary, path)
+
+
+def _read_samples(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return []
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class _DirectoryLock:
+    """flock на файле каталога: слияние исключает чтение в collect()."""
+
+    def __init__(self, directory, operation):
+        self.path = Path(directory) / LOCK_FILE
+        self.operation = operation
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.path, 'a')
+        fcntl.flock(self.file, self.operation)
+
+    def __exit__(self, *exc_info):
+        self.file.close()
+
+
+def merge_stale(directory, own_pid):
+    """Сливает файлы завершившихся процессов и прежний файл own_pid
+    в totals.json, чтобы каталог не рос, а суммы не уменьшались."""
+    directory = Path(directory)
+    with _DirectoryLock(directory, fcntl.LOCK_EX):
+        stale = [
+            path for path in directory.glob('*.json')
+            if path.stem.isdigit()
+            and (int(path.stem) == own_pid or not _alive(int(path.stem)))
+        ]
+        if not stale:
+            return
+        totals_path = directory / TOTALS_FILE
+        totals = defaultdict(float)
+        for path in [totals_path, *stale]:
+            for name, labels, value in _read_samples(path):
+                totals[name, tuple(map(tuple, labels))] += value
+        _write_samples(totals_path, [
+            [name, labels, value] for (name, labels), value in totals.items()
+        ])
+        for path in stale:
+            path.unlink()
+
+
+registry = Registry()
+
+
+def _flush_at_exit():
+    if registry.values:
+        registry.flush(force=True)
+
+
+atexit.register(_flush_at_exit)
+
+
+def collect():
+    """Сумма счётчиков всех процессов по файлам каталога METRICS_DIR."""
+    registry.flush(force=True)
+    totals = defaultdict(float)
+    with _DirectoryLock(settings.METRICS_DIR, fcntl.LOCK_SH):
+        for path in Path(settings.METRICS_DIR).glob('*.json'):
+            for name, labels, value in _read_samples(path):
+                totals[name, tuple(map(tuple, labels))] += value
+    return totals
+
+
+def _escape(value):
+    return (
+        str(value).replace('\\', r'\\').replace('"', r'\"')
+        .replace('\n', r'\n')
+    )
+
+
+def _base_name(name):
+    for suffix in ('_bucket', '_sum', '_count'):
+        base = name[:-len(suffix)]
+        if name.endswith(suffix) and base in METRICS:
+            return base
+    return name
+
+
+def render(totals):
+    """Текстовый формат экспозиции Prometheus."""
+    lines = []
+    described = set()
+    for name, labels in sorted(totals):
+        base = _base_name(name)
+        if base not in described:
+            described.add(base)
+            kind, help_text = METRICS.get(base, ('untyped', ''))
+            lines.append(f'# HELP {base} {help_text}')
+            lines.append(f'# TYPE {base} {kind}')
+        label_text = ','.join(
+            f'{key}="{_escape(value)}"' for key, value in labels
+        )
+        if label_text:
+            label_text = f'{{{label_text}}}'
+        lines.append(f'{name}{label_text} {totals[name, labels]:g}')
+    return '\n'.join(lines) + '\n'
+
+
+def record_cache(cache_name, hit):
+    if settings.METRICS_ENABLED:
+        registry.inc('yatube_cache_requests_total', {
+            'cache': cache_name, 'result': 'hit' if hit else 'miss',
+        })
+
+
+def add_template_time(seconds):
+    if hasattr(_local, 'template_time'):
+        _local.template_time += seconds
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        start = time.monotonic()
+        try:
+            return super().render(context, request)
+        finally:
+            add_template_time(time.monotonic() - start)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Бэкенд DjangoTemplates, замеряющий время отрисовки для метрик."""
+
+    def from_string(self, template_code):
+        template = super().from_string(template_code)
+        return TimedTemplate(template.template, self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+        _local.template_time = 0
+        start = time.monotonic()
+        try:
+            with QueryRecorder() as recorder:
+                response = self.get_response(request)
+            self.record(request, response, recorder, time.monotonic() - start)
+        finally:
+            del _local.template_time
+        registry.flush()
+        return response
+
+    def record(self, request, response, recorder, duration):
+        match = request.resolver_match
+        # Неразрешённые пути не плодят метки: все они попадают в «none».
+        labels = {'view': match.view_name if match else 'none'}
+        registry.inc('yatube_requests_total', {
+            **labels,
+            'method': request.method,
+            'status': str(response.status_code),
+        })
+        registry.observe('yatube_request_duration_seconds', labels, duration)
+        registry.inc('yatube_sql_queries_total', labels, len(recorder))
+        registry.inc(
+            'yatube_sql_duration_seconds_total', labels,
+            sum(elapsed for _, elapsed in recorder.queries),
+        )
+        registry.inc(
+            'yatube_template_render_seconds_total', labels,
+            _local.template_time,
+        )
@@ -0,0 +1,252 @@
+import fcntl
+import gzip
+import hashlib
+import re
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import (cc_delim_re, get_conditional_response,
+                                patch_vary_headers)
+from django.utils.http import parse_http_date_safe
+
+from .metrics import record_cache
+
+CACHEABLE_METHODS = ('GET', 'HEAD')
+MICROCACHE_HEADER = 'X-Microcache'
+ACCEPTS_GZIP_RE = re.compile(r'\bgzip\b')
+MIN_COMPRESS_LENGTH = 200
+LOCK_POLL_INTERVAL = 0.02
+# Файлов блокировок не больше 16 ** LOCK_HASH_LENGTH: адреса делят их
+# по хешу, совпадение лишь заставит запрос подождать чужую отрисовку.
+LOCK_HASH_LENGTH = 3
+# Vary, которые микрокеш обрабатывает сам: сжатие выбирается при отдаче,
+# а Cookie у анонимов без сессии не влияет на страницу.
+HANDLED_VARY = {'accept-encoding', 'cookie'}
+SKIPPED_HEADERS = {'content-length', 'content-encoding', 'vary'}
+PRIVATE_DIRECTIVES = {'private', 'no-cache', 'no-store'}
+
+
+def _hash(text):
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+def is_anonymous(request):
+    """Без cookie сессии и сообщений страница у всех анонимов одинакова."""
+    cookies = (settings.SESSION_COOKIE_NAME, 'messages')
+    return not any(name in request.COOKIES for name in cookies)
+
+
+def base_key(request):
+    url = f'{request.scheme}://{request.get_host()}{request.get_full_path()}'
+    return f'microcache:{_hash(url)}'
+
+
+class RenderLock:
+    """Блокировка отрисовки адреса: flock на файле в MICROCACHE_LOCK_DIR.
+
+    cache.add у FileBasedCache проверяет и пишет запись не атомарно, и два
+    процесса могли взять блокировку одновременно. flock атомарен между
+    процессами и снимается сам, если процесс упал посреди отрисовки.
+    """
+
+    def __init__(self, base):
+        name = base.rsplit(':', 1)[-1][:LOCK_HASH_LENGTH]
+        self.path = Path(settings.MICROCACHE_LOCK_DIR) / f'{name}.lock'
+        self.file = None
+
+    def acquire(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.path, 'a')
+        try:
+            fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.release()
+            return False
+        return True
+
+    def release(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def is_held(self):
+        """Держит ли блокировку другой запрос."""
+        if not self.acquire():
+            return True
+        self.release()
+        return False
+
+
+def page_key(request, base, vary):
+    values = '|'.join(request.META.get(header, '') for header in vary)
+    return f'{base}:{_hash(values)}'
+
+
+def vary_meta_names(response):
+    """Заголовки Vary ответа в виде ключей request.META."""
+    if not response.has_header('Vary'):
+        return ()
+    headers = cc_delim_re.split(response['Vary'])
+    return tuple(sorted(
+        'HTTP_' + header.upper().replace('-', '_')
+        for header in headers if header.lower() not in HANDLED_VARY
+    ))
+
+
+def is_storable(request, response):
+    if response.status_code != 200 or response.streaming:
+        return False
+    # Ответ с cookie или с csrf_token внутри принадлежит одному клиенту.
+    if response.cookies or request.META.get('CSRF_COOKIE_USED'):
+        return False
+    if response.has_header('Content-Encoding'):
+        return False
+    directives = cc_delim_re.split(response.get('Cache-Control', ''))
+    return not PRIVATE_DIRECTIVES.intersection(
+        directive.split('=')[0].lower() for directive in directives
+    )
+
+
+def make_entry(response):
+    body = response.content
+    compressed = len(body) >= MIN_COMPRESS_LENGTH
+    return {
+        'status': response.status_code,
+        'headers': [
+            (name, value) for name, value in response.items()
+            if name.lower() not in SKIPPED_HEADERS
+        ],
+        'vary': response.get('Vary', ''),
+        'gzip': compressed,
+        'body': gzip.compress(body) if compressed else body,
+    }
+
+
+def encoded_etag(etag, encoding):
+    """Сильный ETag сжатого ответа: байты отличаются от несжатых, и
+    валидатор должен отличаться тоже, как "<etag>-gzip" у Apache."""
+    if not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def entry_response(request, entry, state):
+    """Ответ из записи кеша: сжатый, если клиент принимает gzip."""
+    body = entry['body']
+    response = HttpResponse(status=entry['status'])
+    for name, value in entry['headers']:
+        response[name] = value
+    accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if entry['gzip']:
+        if ACCEPTS_GZIP_RE.search(accept_encoding):
+            response['Content-Encoding'] = 'gzip'
+            if response.has_header('ETag'):
+                response['ETag'] = encoded_etag(response['ETag'], 'gzip')
+        else:
+            body = gzip.decompress(body)
+    response.content = body
+    response['Content-Length'] = str(len(body))
+    if entry['vary']:
+        response['Vary'] = entry['vary']
+    patch_vary_headers(response, ('Accept-Encoding',))
+    response[MICROCACHE_HEADER] = state
+    return response
+
+
+class MicrocacheMiddleware:
+    """Кеш целых страниц для анонимов на MICROCACHE_TIMEOUT секунд.
+
+    Тела хранятся сжатыми gzip, Vary ответа входит в ключ, как в
+    django.middleware.cache. Одновременные промахи по одному адресу
+    схлопываются: страницу рисует один запрос, остальные ждут его запись
+    не дольше MICROCACHE_LOCK_TIMEOUT.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.is_cacheable(request):
+            return self.get_response(request)
+        base = base_key(request)
+        response = self.lookup(request, base)
+        if response is not None:
+            record_cache('microcache', True)
+            return response
+        record_cache('microcache', False)
+        lock = RenderLock(base)
+        if lock.acquire():
+            try:
+                return self.render(request, base)
+            finally:
+                lock.release()
+        response = self.wait(request, base, lock)
+        if response is not None:
+            return response
+        return self.render(request, base)
+
+    def is_cacheable(self, request):
+        if not settings.MICROCACHE_ENABLED:
+            return False
+        if request.method not in CACHEABLE_METHODS:
+            return False
+        if not is_anonymous(request):
+            return False
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        if match.view_name not in settings.MICROCACHE_VIEWS:
+            return False
+        # Для метрик и бюджетов запросов: при попадании view не вызывается.
+        request.resolver_match = match
+        return True
+
+    def lookup(self, request, base):
+        vary = cache.get(f'{base}:vary')
+        if vary is None:
+            return None
+        entry = cache.get(page_key(request, base, vary))
+        if entry is None:
+            return None
+        response = entry_response(request, entry, 'HIT')
+        # View с @condition при попадании не вызывается: If-None-Match
+        # проверяется по сохранённым валидаторам.
+        response = get_conditional_response(
+            request,
+            etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(response.get('Last-Modified')),
+            response=response,
+        )
+        response[MICROCACHE_HEADER] = 'HIT'
+        return response
+
+    def wait(self, request, base, lock):
+        deadline = time.monotonic() + settings.MICROCACHE_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            response = self.lookup(request, base)
+            if response is not None:
+                return response
+            if not lock.is_held():
+                # Запись могла появиться между проверками; если нет —
+                # отрисовка не удалась или ответ не кешируемый.
+                return self.lookup(request, base)
+        return None
+
+    def render(self, request, base):
+        response = self.get_response(request)
+        if not is_storable(request, response):
+            return response
+        vary = vary_meta_names(response)
+        entry = make_entry(response)
+        timeout = settings.MICROCACHE_TIMEOUT
+        cache.set_many({
+            f'{base}:vary': vary,
+            page_key(request, base, vary): entry,
+        }, timeout)
+        return entry_response(request, entry, 'MISS')
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Время')),
+                ('duration', models.FloatField(verbose_name='Длительность, мс')),
+                ('sql', models.TextField(verbose_name='SQL')),
+                ('params', models.CharField(blank=True, max_length=200, verbose_name='Типы параметров')),
+                ('normalized', models.TextField(verbose_name='Форма запроса')),
+                ('fingerprint', models.CharField(db_index=True, max_length=32, verbose_name='Отпечаток формы')),
+                ('view', models.CharField(blank=True, max_length=200, verbose_name='View')),
+                ('template', models.CharField(blank=True, max_length=200, verbose_name='Строка шаблона')),
+                ('stack', models.TextField(blank=True, verbose_name='Стек')),
+            ],
+            options={
+                'verbose_name': 'Медленный запрос',
+                'verbose_name_plural': 'Медленные запросы',
+                'ordering': ('-id',),
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import models
+
+
+class RequestProfile(models.Model):
+    """Профили cProfile хранятся файлами в PROFILING_DIR, таблицы нет.
+
+    Модель нужна только для раздела в админке и прав на просмотр.
+    """
+
+    class Meta:
+        managed = False
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+
+
+class SlowQuery(models.Model):
+    """Запрос дольше SLOW_QUERY_THRESHOLD_MS, записанный во время запроса к
+    сайту. Хранится не больше SLOW_QUERY_MAX_ENTRIES последних записей."""
+    created = models.DateTimeField('Время', auto_now_add=True)
+    duration = models.FloatField('Длительность, мс')
+    sql = models.TextField('SQL')
+    params = models.CharField('Типы параметров', max_length=200, blank=True)
+    normalized = models.TextField('Форма запроса')
+    fingerprint = models.CharField(
+        'Отпечаток формы', max_length=32, db_index=True
+    )
+    view = models.CharField('View', max_length=200, blank=True)
+    template = models.CharField('Строка шаблона', max_length=200, blank=True)
+    stack = models.TextField('Стек', blank=True)
+
+    class Meta:
+        ordering = ('-id',)
+        verbose_name = 'Медленный запрос'
+        verbose_name_plural = 'Медленные запросы'
+
+    def __str__(self):
+        return f'{self.duration:.0f} мс: {self.sql[:60]}'
@@ -0,0 +1,112 @@
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_PARAM = '_profile'
+PROFILE_FILE_HEADER = 'X-Profile-File'
+FILE_NAME_RE = re.compile(r'^[\w.:-]+\.prof$')
+
+# cProfile профилирует только свой поток, но два профилировщика в одном
+# процессе мешают друг другу: одновременно снимается один профиль.
+_lock = threading.Lock()
+
+
+def _slug(text):
+    return re.sub(r'[^\w.:-]+', '_', text).strip('_')[:60] or 'none'
+
+
+def profiles_dir():
+    return Path(settings.PROFILING_DIR)
+
+
+def list_profiles():
+    """Файлы профилей, новые первыми."""
+    directory = profiles_dir()
+    if not directory.is_dir():
+        return []
+    files = [
+        path for path in directory.iterdir()
+        if FILE_NAME_RE.match(path.name)
+    ]
+    return sorted(files, key=lambda path: path.name, reverse=True)
+
+
+def get_profile_path(name):
+    """Путь к профилю по имени файла; None для чужих имён и путей."""
+    if not FILE_NAME_RE.match(name):
+        return None
+    path = profiles_dir() / name
+    return path if path.is_file() else None
+
+
+def profile_stats(path, limit=50):
+    """Текст pstats: самые дорогие функции по суммарному времени."""
+    output = io.StringIO()
+    stats = pstats.Stats(str(path), stream=output)
+    stats.sort_stats('cumulative').print_stats(limit)
+    return output.getvalue()
+
+
+def _rotate():
+    for path in list_profiles()[settings.PROFILING_MAX_FILES:]:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+def save_profile(profiler, request, duration):
+    match = request.resolver_match
+    view = match.view_name if match else request.path
+    name = (
+        f'{datetime.now():%Y%m%d-%H%M%S.%f}-{_slug(view)}-'
+        f'{duration * 1000:.0f}ms-{os.getpid()}.prof'
+    )
+    directory = profiles_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    profiler.dump_stats(str(directory / name))
+    _rotate()
+    return name
+
+
+def is_requested(request):
+    """Профиль по заголовку X-Profile или ?_profile=1 — только для staff,
+    иначе выборочно каждый PROFILING_SAMPLE_RATE-й запрос."""
+    asked = request.META.get(PROFILE_HEADER) or request.GET.get(PROFILE_PARAM)
+    if asked and request.user.is_staff:
+        return True
+    rate = settings.PROFILING_SAMPLE_RATE
+    return bool(rate) and random.randrange(rate) == 0
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not is_requested(request) or not _lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            profiler = cProfile.Profile()
+            start = time.monotonic()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            name = save_profile(profiler, request, time.monotonic() - start)
+        finally:
+            _lock.release()
+        if request.user.is_staff:
+            response[PROFILE_FILE_HEADER] = name
+        return response
@@ -0,0 +1,134 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+IN_LIST_RE = re.compile(r'\((?:%s, )+%s\)')
+LIMIT_RE = re.compile(r'\b(LIMIT|OFFSET) \d+')
+TRANSACTION_RE = re.compile(
+    r'^(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE)\b', re.IGNORECASE
+)
+
+
+_expected = threading.local()
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+@contextmanager
+def expected_repeats():
+    """Повторы запросов внутри блока задуманы и ограничены, в N+1 они не
+    попадают; в бюджет запросов view по-прежнему входят."""
+    _expected.depth = getattr(_expected, 'depth', 0) + 1
+    try:
+        yield
+    finally:
+        _expected.depth -= 1
+
+
+def normalize_sql(sql):
+    """Форма запроса: параметры уже вынесены, схлопываем списки IN
+    и числа в LIMIT/OFFSET."""
+    return LIMIT_RE.sub(r'\1 %d', IN_LIST_RE.sub('(%s, ...)', sql))
+
+
+class QueryRecorder:
+    """Записывает SQL-запросы всех соединений на время блока with.
+
+    Управление транзакциями и точками сохранения в бюджет не входит.
+    """
+
+    def __init__(self):
+        self.queries = []
+        self.expected = set()
+        self._stack = ExitStack()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if not TRANSACTION_RE.match(sql):
+                if getattr(_expected, 'depth', 0):
+                    self.expected.add(len(self.queries))
+                self.queries.append((sql, time.monotonic() - start))
+
+    def __enter__(self):
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def __len__(self):
+        return len(self.queries)
+
+    def repeated_shapes(self, threshold=None):
+        """Формы запросов, повторённые не меньше threshold раз (N+1)."""
+        if threshold is None:
+            threshold = settings.QUERY_BUDGET_N_PLUS_ONE_THRESHOLD
+        shapes = Counter(
+            normalize_sql(sql)
+            for index, (sql, _) in enumerate(self.queries)
+            if index not in self.expected
+        )
+        return {
+            shape: count for shape, count in shapes.items()
+            if count >= threshold
+        }
+
+
+@lru_cache(maxsize=None)
+def get_query_budget(view_name):
+    """Бюджет из словаря query_budgets в urls.py пространства имён."""
+    *namespaces, name = view_name.split(':')
+    resolver = get_resolver()
+    for namespace in namespaces:
+        _, resolver = resolver.namespace_dict[namespace]
+    return getattr(resolver.urlconf_module, 'query_budgets', {}).get(name)
+
+
+def check_query_budget(view_name, recorder):
+    """Список нарушений бюджета и N+1 для одного запроса к view."""
+    problems = []
+    budget = get_query_budget(view_name)
+    if budget is not None and len(recorder) > budget:
+        problems.append(
+            f'{view_name}: {len(recorder)} SQL-запросов при бюджете {budget}'
+        )
+    for shape, count in recorder.repeated_shapes().items():
+        problems.append(f'{view_name}: N+1, {count} раз: {shape}')
+    return problems
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.QUERY_BUDGET_ENABLED:
+            return self.get_response(request)
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        request.query_recorder = recorder
+        match = request.resolver_match
+        if match is None:
+            return response
+        problems = check_query_budget(match.view_name, recorder)
+        for problem in problems:
+            logger.warning(problem)
+        if problems and settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded('; '.join(problems))
+        return response
@@ -0,0 +1,136 @@
+import hashlib
+import logging
+import os
+import sys
+import time
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.template.base import Node
+
+from .models import SlowQuery
+from .query_budget import TRANSACTION_RE, QueryRecorder, normalize_sql
+
+logger = logging.getLogger(__name__)
+
+STACK_DEPTH = 10
+_render_annotated = Node.render_annotated.__code__
+
+
+def params_shape(params, many):
+    """Типы параметров без значений: в лог не попадают данные."""
+    if many:
+        params = list(params)
+        first = params_shape(params[0], False) if params else ''
+        return f'{len(params)} x ({first})'
+    if params is None:
+        return ''
+    if isinstance(params, dict):
+        return ', '.join(
+            f'{key}: {type(value).__name__}' for key, value in params.items()
+        )
+    return ', '.join(type(value).__name__ for value in params)
+
+
+def template_position(frame):
+    """Шаблон и строка узла, который отрисовывался во время запроса."""
+    while frame is not None:
+        if frame.f_code is _render_annotated:
+            node = frame.f_locals['self']
+            token = getattr(node, 'token', None)
+            origin = getattr(node, 'origin', None)
+            if token is not None and origin is not None:
+                name = origin.template_name or origin.name
+                return f'{name}:{token.lineno}'
+        frame = frame.f_back
+    return ''
+
+
+def project_stack(frame):
+    """Кадры кода проекта, внутренние последними."""
+    base_dir = str(settings.BASE_DIR)
+    lines = []
+    while frame is not None and len(lines) < STACK_DEPTH:
+        path = frame.f_code.co_filename
+        if (
+            path.startswith(base_dir)
+            and 'site-packages' not in path and path != __file__
+        ):
+            lines.append(
+                f'{os.path.relpath(path, base_dir)}:{frame.f_lineno} '
+                f'in {frame.f_code.co_name}'
+            )
+        frame = frame.f_back
+    return '\n'.join(reversed(lines))
+
+
+class SlowQueryRecorder(QueryRecorder):
+    """Запоминает только запросы дольше SLOW_QUERY_THRESHOLD_MS.
+
+    Стек и позиция в шаблоне снимаются в момент выполнения запроса,
+    запись в базу — после ответа, вне обёртки.
+    """
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.monotonic() - start) * 1000
+            if (
+                duration >= settings.SLOW_QUERY_THRESHOLD_MS
+                and not TRANSACTION_RE.match(sql)
+            ):
+                frame = sys._getframe(1)
+                self.queries.append({
+                    'duration': duration,
+                    'sql': sql,
+                    'params': params_shape(params, many)[:200],
+                    'template': template_position(frame)[:200],
+                    'stack': project_stack(frame),
+                })
+
+
+def fingerprint(normalized):
+    return hashlib.md5(normalized.encode()).hexdigest()
+
+
+def save_slow_queries(queries, view):
+    entries = []
+    for query in queries:
+        normalized = normalize_sql(query['sql'])
+        entries.append(SlowQuery(
+            view=view[:200],
+            normalized=normalized,
+            fingerprint=fingerprint(normalized),
+            **query
+        ))
+    SlowQuery.objects.bulk_create(entries)
+    # Журнал ограничен: старые записи вытесняются новыми.
+    last = SlowQuery.objects.latest('pk').pk
+    SlowQuery.objects.filter(
+        pk__lte=last - settings.SLOW_QUERY_MAX_ENTRIES
+    ).delete()
+
+
+class SlowQueryMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if settings.SLOW_QUERY_THRESHOLD_MS is None:
+            return self.get_response(request)
+        with SlowQueryRecorder() as recorder:
+            response = self.get_response(request)
+        if recorder.queries:
+            match = request.resolver_match
+            try:
+                save_slow_queries(
+                    recorder.queries,
+                    match.view_name if match else request.path,
+                )
+            except DatabaseError:
+                # Журнал не должен превращать готовый ответ в 500, например
+                # при «database is locked» под нагрузкой записи.
+                logger.exception('Не удалось записать медленные запросы')
+        return response
@@ -0,0 +1,41 @@
+import re
+
+from django.conf import settings
+
+PRAGMA_VALUE_RE = re.compile(r'^-?\w+$')
+# PRAGMA, которые хранятся в самом файле базы, а не в соединении
+PERSISTENT_PRAGMAS = {'journal_mode'}
+
+# Базы, в которых постоянные PRAGMA уже выставлены этим процессом
+_configured_databases = set()
+
+
+def apply_pragmas(cursor, pragmas):
+    """Выполняет PRAGMA name = value для каждой пары словаря."""
+    for name, value in pragmas.items():
+        if not all(PRAGMA_VALUE_RE.match(str(part)) for part in (name, value)):
+            raise ValueError(f'Недопустимая PRAGMA: {name} = {value}')
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Обработчик connection_created: PRAGMA из SQLITE_PRAGMAS для каждого
+    нового соединения с SQLite.
+
+    Выполняются на самом соединении sqlite3, мимо курсоров Django: это
+    настройка, а не запросы view, и в бюджеты запросов она не входит.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = dict(settings.SQLITE_PRAGMAS)
+    name = connection.settings_dict['NAME']
+    if name in _configured_databases:
+        for pragma in PERSISTENT_PRAGMAS:
+            pragmas.pop(pragma, None)
+    else:
+        _configured_databases.add(name)
+    cursor = connection.connection.cursor()
+    try:
+        apply_pragmas(cursor, pragmas)
+    finally:
+        cursor.close()
@@ -1,18 +1,207 @@
-from django.contrib import admin
+import time
 
-from .models import Group, Post
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.admin.widgets import ForeignKeyRawIdWidget
+from django.contrib.auth import get_permission_codename
+from django.contrib.auth.admin import UserAdmin
+from django.core.paginator import Paginator
+from django.urls import NoReverseMatch, reverse
+from django.utils.functional import cached_property
+from django.utils.text import Truncator
 
+from core.admin import admin_page
+from core.query_budget import expected_repeats
 
-class GroupAdmin(admin.ModelAdmin):
+from . import bulk
+from .cache import feed_count, index_feed
+from .deletion import posts_count, schedule_deletion
+from .models import DeletionJob, Follow, Group, Post, User
+from .search import filter_posts
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор changelist без COUNT(*) по всей таблице.
+
+    Без фильтров число постов берётся из кешированного счётчика по версии
+    главной ленты, с фильтрами считается не дальше ADMIN_COUNT_LIMIT
+    строк; capped отмечает, что строк может быть больше.
+    """
+    capped = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            # Все посты, со скрытыми: отдельный от главной ленты счётчик.
+            return feed_count(index_feed(), Post.objects.all(), 'admin')
+        limit = settings.ADMIN_COUNT_LIMIT
+        count = queryset.order_by()[:limit].count()
+        self.capped = count >= limit
+        return count
+
+
+class LoadedRawIdWidget(ForeignKeyRawIdWidget):
+    """Поле id со ссылкой; подпись берётся из уже загруженного объекта,
+    а не отдельным запросом на каждую строку."""
+    loaded = None
+
+    def label_and_url_for_value(self, value):
+        obj = self.loaded
+        if obj is None or str(obj.pk) != str(value):
+            return super().label_and_url_for_value(value)
+        opts = obj._meta
+        try:
+            url = reverse(
+                f'{self.admin_site.name}:{opts.app_label}_{opts.model_name}'
+                '_change',
+                args=(obj.pk,),
+            )
+        except NoReverseMatch:
+            url = ''
+        return Truncator(obj).words(14), url
+
+
+class PostChangeListForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        widget = self.fields['group'].widget
+        # При сохранении строки приходят без select_related: группу не
+        # загружаем отдельным запросом на каждую.
+        if (isinstance(widget, LoadedRawIdWidget)
+                and Post.group.is_cached(self.instance)):
+            widget.loaded = self.instance.group
+
+
+class GroupActionForm(ActionForm):
+    group = forms.CharField(
+        label='Группа (slug)', required=False, max_length=100,
+    )
+
+
+class PostActionForm(GroupActionForm):
+    author = forms.CharField(
+        label='Автор (username)', required=False, max_length=150,
+    )
+
+
+class PostBulkActionsMixin:
+    """Массовые действия над постами: UPDATE и DELETE пачками вместо
+    сохранения и удаления каждого объекта по отдельности."""
+    action_form = GroupActionForm
+
+    def get_post_ids(self, queryset):
+        return queryset.order_by().values_list('pk', flat=True)
+
+    def has_post_permission(self, request, action):
+        # Действия висят и на GroupAdmin, а меняют посты: права нужны на
+        # модель Post, а не на модель страницы.
+        opts = Post._meta
+        codename = get_permission_codename(action, opts)
+        return request.user.has_perm(f'{opts.app_label}.{codename}')
+
+    def has_change_posts_permission(self, request):
+        return self.has_post_permission(request, 'change')
+
+    def has_delete_posts_permission(self, request):
+        return self.has_post_permission(request, 'delete')
+
+    def get_target(self, request, model, field, lookup):
+        value = request.POST.get(field, '').strip()
+        target = model.objects.filter(**{lookup: value}).first()
+        if target is None:
+            self.message_user(
+                request,
+                f'Не найдено: {model._meta.verbose_name} «{value}»',
+                messages.ERROR,
+            )
+        return target
+
+    def run_bulk(self, request, queryset, message, operation, *args):
+        start = time.monotonic()
+        done = operation(self.get_post_ids(queryset), *args)
+        self.message_user(
+            request,
+            f'{message}: {done} за {time.monotonic() - start:.2f} с',
+            messages.SUCCESS,
+        )
+
+    def move_posts_to_group(self, request, queryset):
+        group = self.get_target(request, Group, 'group', 'slug')
+        if group is not None:
+            self.run_bulk(
+                request, queryset, f'Перенесено постов в «{group}»',
+                bulk.move_posts, group,
+            )
+    move_posts_to_group.short_description = (
+        'Перенести посты в группу из поля «Группа»'
+    )
+    move_posts_to_group.allowed_permissions = ('change_posts', )
+
+    def delete_posts(self, request, queryset):
+        if not request.POST.get('confirm'):
+            return admin_page(
+                self, request, 'admin/posts/confirm_bulk_delete.html',
+                title='Удаление постов',
+                posts_count=self.get_post_ids(queryset).count(),
+                fields=[
+                    (name, value) for name in request.POST
+                    if name != 'csrfmiddlewaretoken'
+                    for value in request.POST.getlist(name)
+                ],
+            )
+        self.run_bulk(request, queryset, 'Удалено постов', bulk.delete_posts)
+        return None
+    delete_posts.short_description = 'Удалить посты'
+    delete_posts.allowed_permissions = ('delete_posts', )
+
+
+class DeferredDeletionMixin:
+    """Удаление через DeletionJob: объект сразу скрывается, а посты
+    удаляет команда process_deletions.
+
+    Страница подтверждения не обходит связанные посты сборщиком.
+    """
+
+    def get_deleted_objects(self, objs, request):
+        objs = list(objs)
+        deleted = [
+            f'{obj}: постов {posts_count(obj)}, удалятся в фоне'
+            for obj in objs
+        ]
+        perms_needed = set()
+        if not self.has_delete_permission(request):
+            perms_needed.add(self.model._meta.verbose_name)
+        counts = {self.model._meta.verbose_name_plural: len(objs)}
+        return deleted, counts, perms_needed, []
+
+    def delete_model(self, request, obj):
+        schedule_deletion(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            schedule_deletion(obj)
+
+
+class GroupAdmin(DeferredDeletionMixin, PostBulkActionsMixin,
+                 admin.ModelAdmin):
     list_display = (
         'pk',
         'title',
         'slug',
         'description',
     )
+    actions = ('move_posts_to_group', 'delete_posts')
+
+    def get_post_ids(self, queryset):
+        return Post.objects.filter(group__in=queryset).order_by().values_list(
+            'pk', flat=True
+        )
 
 
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(PostBulkActionsMixin, admin.ModelAdmin):
     list_display = (
         'pk',
         'text',
@@ -21,10 +210,121 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group', )
+    list_select_related = ('author', 'group')
+    raw_id_fields = ('group', )
     search_fields = ('text', )
     list_filter = ('pub_date', )
+    date_hierarchy = 'pub_date'
     empty_value_display = '-пусто-'
+    # Список больших таблиц: без точного счёта всех строк и без <select>
+    # всех групп в каждой из строк страницы.
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    action_form = PostActionForm
+    actions = (
+        'move_posts_to_group',
+        'remove_posts_from_group',
+        'reassign_posts',
+        'delete_posts',
+    )
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        # Стандартное удаление загружает каждый пост через Collector.
+        actions.pop('delete_selected', None)
+        return actions
+
+    def remove_posts_from_group(self, request, queryset):
+        self.run_bulk(
+            request, queryset, 'Убрано постов из групп',
+            bulk.move_posts, None,
+        )
+    remove_posts_from_group.short_description = 'Убрать посты из групп'
+    remove_posts_from_group.allowed_permissions = ('change_posts', )
+
+    def reassign_posts(self, request, queryset):
+        author = self.get_target(request, User, 'author', 'username')
+        if author is not None:
+            self.run_bulk(
+                request, queryset, f'Передано постов автору {author}',
+                bulk.reassign_posts, author,
+            )
+    reassign_posts.short_description = (
+        'Передать посты автору из поля «Автор»'
+    )
+    reassign_posts.allowed_permissions = ('change_posts', )
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('text_html')
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.raw_id_fields:
+            kwargs['widget'] = LoadedRawIdWidget(
+                db_field.remote_field, self.admin_site
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method == 'POST' and '_save' in request.POST:
+            # list_editable проверяет id и группу каждой строки своими
+            # запросами; строк не больше list_per_page.
+            with expected_repeats():
+                return super().changelist_view(request, extra_context)
+        return super().changelist_view(request, extra_context)
+
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault('form', PostChangeListForm)
+        return super().get_changelist_form(request, **kwargs)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по text идёт через индекс FTS5, а не через LIKE '%...%'.
+        if not search_term.strip():
+            return queryset, False
+        return filter_posts(queryset, search_term), False
+
+
+class FollowAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'user',
+        'author',
+    )
+    raw_id_fields = ('user', 'author')
+
+
+class DeferredDeletionUserAdmin(DeferredDeletionMixin, UserAdmin):
+    pass
+
+
+class DeletionJobAdmin(admin.ModelAdmin):
+    list_display = (
+        '__str__',
+        'progress_display',
+        'done',
+        'total',
+        'created',
+        'finished',
+    )
+    list_filter = ('kind', )
+    empty_value_display = '-пусто-'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def progress_display(self, obj):
+        return f'{obj.progress}%'
+    progress_display.short_description = 'Прогресс'
 
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
+admin.site.register(Follow, FollowAdmin)
+admin.site.register(DeletionJob, DeletionJobAdmin)
+admin.site.unregister(User)
+admin.site.register(User, DeferredDeletionUserAdmin)
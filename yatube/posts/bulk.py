@@ -0,0 +1,156 @@
+from django.db import connections, router, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .cache import (all_feeds, author_feed, bump_feed_version, group_feed,
+                    index_feed, invalidate_feeds)
+from .counters import (recount_authors, recount_groups, refresh_author_counts,
+                       refresh_group_counts)
+from .models import Group, Post, TimelineEntry, User
+from .timeline import fan_out_posts, fan_out_since
+
+BULK_BATCH_SIZE = 500
+
+
+def _rendered(posts):
+    for post in posts:
+        if post.pub_date is None:
+            post.pub_date = timezone.now()
+        post.render_text()
+        yield post
+
+
+def _insert_raw(posts, batch_size):
+    """INSERT пачками в режиме raw, как у loaddata: значения полей берутся
+    из объектов без pre_save, поэтому auto_now_add не затирает pub_date
+    из данных, а само поле модели не меняется.
+
+    bulk_create() здесь не подходит: он вызывает pre_save, а вернуть
+    pub_date следующим UPDATE нельзя — SQLite не отдаёт pk вставленных
+    строк. Размер пачки, как и в bulk_create(), ограничен числом
+    параметров запроса, которое допускает база.
+    """
+    fields = [
+        field for field in Post._meta.concrete_fields
+        if not field.primary_key
+    ]
+    using = router.db_for_write(Post)
+    max_batch_size = connections[using].ops.bulk_batch_size(fields, posts)
+    batch_size = max(1, min(batch_size, max_batch_size))
+    with transaction.atomic(using=using, savepoint=False):
+        for batch in chunked(posts, batch_size):
+            Post.objects._insert(batch, fields=fields, using=using, raw=True)
+            for post in batch:
+                post._state.adding = False
+                post._state.db = using
+
+
+def bulk_create_posts(posts, batch_size=BULK_BATCH_SIZE):
+    """Вставка пачками без save() и сигналов: HTML и анонс считаются здесь,
+    как и раскладка по лентам подписок; счётчики и кеш чинит
+    finish_bulk_load."""
+    # SQLite не возвращает pk вставленных пачкой строк: новые посты — всё,
+    # что выше прежнего наибольшего pk.
+    last_pk = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+    posts = list(_rendered(posts))
+    _insert_raw(posts, batch_size)
+    fan_out_since(last_pk)
+    return posts
+
+
+def finish_bulk_load():
+    """Пересчёт счётчиков и сброс всех лент после массовой загрузки."""
+    recount_groups()
+    recount_authors()
+    bump_feed_version(all_feeds())
+
+
+def chunked(ids, size=BULK_BATCH_SIZE):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _apply_in_chunks(post_ids, change):
+    """Вызывает change(ids) пачками, каждую в своей транзакции, чтобы
+    не держать блокировку базы на всё изменение.
+
+    Возвращает число строк и множества затронутых авторов и групп.
+    """
+    author_ids, group_ids = set(), set()
+    done = 0
+    for chunk in chunked(post_ids):
+        with transaction.atomic():
+            relations = Post.objects.filter(pk__in=chunk).order_by(
+            ).values_list('author_id', 'group_id').distinct()
+            for author_id, group_id in relations:
+                author_ids.add(author_id)
+                group_ids.add(group_id)
+            done += change(chunk)
+    return done, author_ids, group_ids
+
+
+def _refresh(author_ids, group_ids):
+    """Счётчики и ленты затронутых авторов и групп после изменения."""
+    group_ids = group_ids - {None}
+    feeds = [index_feed()]
+    for chunk in chunked(group_ids):
+        refresh_group_counts(chunk)
+        feeds.extend(map(group_feed, Group.objects.filter(
+            pk__in=chunk
+        ).values_list('slug', flat=True)))
+    for chunk in chunked(author_ids):
+        refresh_author_counts(chunk)
+        feeds.extend(map(author_feed, User.objects.filter(
+            pk__in=chunk
+        ).values_list('username', flat=True)))
+    invalidate_feeds(feeds)
+
+
+def move_posts(post_ids, group):
+    """Переносит посты в группу (None — убирает из групп) без save() и
+    сигналов. Возвращает число изменённых постов."""
+    group_id = group.pk if group is not None else None
+    done, author_ids, group_ids = _apply_in_chunks(
+        post_ids,
+        lambda chunk: Post.objects.filter(pk__in=chunk).update(
+            group_id=group_id
+        ),
+    )
+    _refresh(author_ids, group_ids | {group_id})
+    return done
+
+
+def reassign_posts(post_ids, author):
+    """Передаёт посты другому автору; ленты подписок перестраиваются
+    под подписчиков нового автора."""
+    def change(chunk):
+        TimelineEntry.objects.filter(post_id__in=chunk).delete()
+        updated = Post.objects.filter(pk__in=chunk).update(author=author)
+        fan_out_posts(author.pk, Post.objects.filter(pk__in=chunk).only(
+            'pk', 'pub_date'
+        ))
+        return updated
+
+    done, author_ids, group_ids = _apply_in_chunks(post_ids, change)
+    _refresh(author_ids | {author.pk}, group_ids)
+    return done
+
+
+def delete_posts(post_ids):
+    """Удаляет посты одним DELETE на пачку, без загрузки объектов.
+
+    Collector и сигналы post_delete не запускаются. Их работу делают здесь:
+    записи лент — единственное, что ссылается на пост, — удаляются до
+    постов, счётчики и ленты чинит _refresh. Новую ссылку на Post нужно
+    удалять здесь же, иначе DELETE оставит сирот; за этим следит
+    тест test_delete_posts_clears_every_relation.
+    """
+    def change(chunk):
+        TimelineEntry.objects.filter(post_id__in=chunk).delete()
+        posts = Post.objects.filter(pk__in=chunk)
+        return posts._raw_delete(posts.db)
+
+    done, author_ids, group_ids = _apply_in_chunks(post_ids, change)
+    _refresh(author_ids, group_ids)
+    return done
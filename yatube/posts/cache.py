@@ -0,0 +1,230 @@
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+
+from core.db_router import reads_from_replica
+from core.metrics import record_cache
+
+from .models import Post
+from .utils import paginate_page
+
+FEED_PAGE_PARAMS = ('page', 'after', 'before')
+
+
+def index_feed():
+    return 'index'
+
+
+def group_feed(slug):
+    return f'group:{slug}'
+
+
+def author_feed(username):
+    return f'author:{username}'
+
+
+def follows_feed(user_id):
+    """Подписки читателя: от них зависит кнопка подписки в профилях."""
+    return f'follows:{user_id}'
+
+
+def groups_feed():
+    """Версия, общая для всех групп: названия групп есть на любой странице."""
+    return 'groups'
+
+
+def _version_key(feed):
+    return f'posts:feed-version:{feed}'
+
+
+def _initial_version():
+    # Версия от времени, а не с единицы: если ключ версии вытеснен
+    # из кеша, старые страницы не совпадут с новой версией.
+    return int(time.time() * 1000)
+
+
+def all_feeds():
+    """Общая версия всех лент, сбрасывается после массовых изменений."""
+    return 'all'
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def get_feed_version(feed):
+    keys = (_version_key(all_feeds()), _version_key(feed))
+    versions = cache.get_many(keys)
+    return '.'.join(
+        str(versions.get(key) or _get_version(key)) for key in keys
+    )
+
+
+def _written_key(feed):
+    return f'posts:feed-written:{feed}'
+
+
+def bump_feed_version(*feeds):
+    for feed in feeds:
+        key = _version_key(feed)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), None)
+    cache.set_many(
+        {_written_key(feed): True for feed in feeds},
+        settings.REPLICA_STICKY_SECONDS,
+    )
+
+
+def _fresh_reads(feed, posts):
+    """Пока после записи в ленту не прошло REPLICA_STICKY_SECONDS,
+    реплика может её ещё не видеть. Прочитанная с неё страница легла бы
+    в кеш под новой версией, а ETag отвечал бы 304 на устаревшую
+    страницу, поэтому в это время лента читается из основной базы."""
+    if not reads_from_replica():
+        return posts
+    if cache.get_many([_written_key(all_feeds()), _written_key(feed)]):
+        return posts.using(DEFAULT_DB_ALIAS)
+    return posts
+
+
+def invalidate_feeds(feeds):
+    bump_feed_version(*feeds)
+    # Повтор после коммита: читатель мог успеть закешировать страницу
+    # без ещё не зафиксированного изменения.
+    transaction.on_commit(lambda: bump_feed_version(*feeds))
+
+
+def _detach_page(page_obj):
+    """Готовит страницу к pickle: queryset ленты не сериализуется."""
+    page_obj.object_list = list(page_obj.object_list)
+    paginator = page_obj.paginator
+    if not getattr(paginator, 'cursor_mode', False):
+        # count и num_pages — cached_property, значения уйдут в кеш.
+        paginator.num_pages
+    # Выборка не нужна: при pickle queryset выполняется, а подзапрос
+    # EXISTS с OuterRef вне основного запроса не компилируется.
+    paginator.object_list = []
+    return page_obj
+
+
+def get_feed_page(request, feed, posts, count=None):
+    """Страница ленты из кеша, ключ включает текущие версии ленты и
+    групп."""
+    params = '&'.join(
+        f'{name}={request.GET.get(name, "")}' for name in FEED_PAGE_PARAMS
+    )
+    # Версия групп входит в ключ: страница ссылается на группы по slug.
+    version = f'{get_feed_version(feed)}.{get_feed_version(groups_feed())}'
+    key = f'posts:feed:{feed}:{version}:{params}'
+    page_obj = cache.get(key)
+    record_cache('feed', page_obj is not None)
+    if page_obj is None:
+        posts = _fresh_reads(feed, posts)
+        page_obj = _detach_page(paginate_page(request, posts, count))
+        cache.set(key, page_obj, settings.POSTS_FEED_CACHE_TIMEOUT)
+    return page_obj
+
+
+_count_executor = ThreadPoolExecutor(max_workers=1)
+
+
+def _count_key(feed, name=''):
+    return f'posts:count:{feed}:{name}' if name else f'posts:count:{feed}'
+
+
+def _refresh_count(key, feed, version, posts):
+    count = _fresh_reads(feed, posts).count()
+    cache.set(key, (version, count), None)
+    return count
+
+
+def _refresh_count_in_thread(key, feed, version, posts):
+    try:
+        _refresh_count(key, feed, version, posts)
+    finally:
+        connection.close()
+
+
+def feed_count(feed, posts, name=''):
+    """Число постов ленты из кеша, без COUNT(*) на каждый запрос.
+
+    Пока версия ленты не менялась, счётчик точный. После изменений
+    небольшие ленты пересчитываются сразу, а большие отдают прежнее
+    значение и пересчитываются в фоновом потоке не чаще раза в
+    POSTS_COUNT_REFRESH_INTERVAL секунд. name отличает другую выборку
+    той же ленты: у неё свой счётчик при общей версии.
+    """
+    version = get_feed_version(feed)
+    key = _count_key(feed, name)
+    cached = cache.get(key)
+    if cached is None:
+        return _refresh_count(key, feed, version, posts)
+    cached_version, count = cached
+    if cached_version == version:
+        return count
+    if count <= settings.POSTS_COUNT_SYNC_LIMIT:
+        return _refresh_count(key, feed, version, posts)
+    if cache.add(
+        f'{key}:refreshing', True, settings.POSTS_COUNT_REFRESH_INTERVAL,
+    ):
+        _count_executor.submit(
+            _refresh_count_in_thread, key, feed, version, posts
+        )
+    return count
+
+
+def _etag(request, *feeds):
+    """ETag из версий лент, без запросов к базе.
+
+    Шапка страницы зависит от пользователя, поэтому в ETag входит хеш
+    cookie сессии.
+    """
+    parts = [str(get_feed_version(feed)) for feed in feeds + (groups_feed(),)]
+    parts.extend((
+        request.get_full_path(),
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME, ''),
+        str(settings.POSTS_CURSOR_PAGINATION),
+        str(date.today().year),
+    ))
+    return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+
+def index_etag(request):
+    return _etag(request, index_feed())
+
+
+def group_etag(request, slug):
+    return _etag(request, group_feed(slug))
+
+
+def profile_etag(request, username):
+    feeds = (author_feed(username),)
+    if request.user.is_authenticated:
+        feeds += (follows_feed(request.user.pk),)
+    return _etag(request, *feeds)
+
+
+def post_etag(request, post_id):
+    # Страница поста показывает счётчик постов автора: валидатор берём
+    # из версии ленты автора, её сбрасывает и правка самого поста.
+    post = Post.objects.filter(pk=post_id).values_list(
+        'author__username', 'group__slug'
+    ).first()
+    if post is None:
+        return None
+    username, slug = post
+    feeds = (author_feed(username),)
+    if slug is not None:
+        feeds += (group_feed(slug),)
+    return _etag(request, *feeds)
@@ -0,0 +1,114 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import AuthorStats, Follow, Group, Post
+
+RECOUNT_BATCH_SIZE = 1000
+
+
+def shifted(field, delta):
+    """F(field) + delta не ниже нуля: счётчик мог разойтись с таблицей
+    (массовые загрузки правит finish_bulk_load), а CHECK поля
+    PositiveIntegerField не должен ронять удаление поста."""
+    return Greatest(F(field) + delta, 0)
+
+
+def change_group_count(group_id, delta):
+    if group_id is not None:
+        Group.objects.filter(pk=group_id).update(
+            posts_count=shifted('posts_count', delta)
+        )
+
+
+def change_author_count(author_id, delta):
+    updated = AuthorStats.objects.filter(user_id=author_id).update(
+        posts_count=shifted('posts_count', delta)
+    )
+    if not updated and delta > 0:
+        # Первый пост автора: строку счётчика заводим пересчётом.
+        AuthorStats.objects.bulk_create([AuthorStats(
+            user_id=author_id,
+            posts_count=Post.objects.filter(author_id=author_id).count(),
+        )], ignore_conflicts=True)
+
+
+def author_posts_count(author):
+    """Счётчик автора или None, если строки счётчика ещё нет."""
+    try:
+        return author.stats.posts_count
+    except AuthorStats.DoesNotExist:
+        return None
+
+
+def recount_groups():
+    """Чинит разошедшиеся счётчики групп, возвращает число исправленных."""
+    drifted = []
+    groups = Group.objects.annotate(actual=Count('posts')).only(
+        'pk', 'posts_count'
+    )
+    for group in groups.iterator(chunk_size=RECOUNT_BATCH_SIZE):
+        if group.posts_count != group.actual:
+            group.posts_count = group.actual
+            drifted.append(group)
+    Group.objects.bulk_update(
+        drifted, ['posts_count'], batch_size=RECOUNT_BATCH_SIZE
+    )
+    return len(drifted)
+
+
+def recount_authors():
+    """Чинит счётчики авторов, возвращает число исправленных строк."""
+    actual = dict(
+        Post.objects.order_by().values_list('author').annotate(Count('id'))
+    )
+    drifted = []
+    for stats in AuthorStats.objects.iterator(chunk_size=RECOUNT_BATCH_SIZE):
+        posts_count = actual.pop(stats.user_id, 0)
+        if stats.posts_count != posts_count:
+            stats.posts_count = posts_count
+            drifted.append(stats)
+    AuthorStats.objects.bulk_update(
+        drifted, ['posts_count'], batch_size=RECOUNT_BATCH_SIZE
+    )
+    # Размер пачки выбирает бэкенд: у SQLite вставка идёт одним
+    # составным SELECT, а в нём не больше 500 частей.
+    AuthorStats.objects.bulk_create(
+        AuthorStats(user_id=user_id, posts_count=posts_count)
+        for user_id, posts_count in actual.items()
+    )
+    return len(drifted) + len(actual)
+
+
+def _rows_count(model, field):
+    """Подзапрос: число строк model, ссылающихся полем field на строку
+    внешней таблицы."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(count=Count('pk')).values('count')
+    ), 0)
+
+
+def refresh_group_counts(group_ids):
+    """Пересчёт счётчиков указанных групп одним UPDATE."""
+    Group.objects.filter(pk__in=group_ids).update(
+        posts_count=_rows_count(Post, 'group')
+    )
+
+
+def refresh_author_counts(author_ids):
+    """Пересчёт счётчиков указанных авторов одним UPDATE."""
+    AuthorStats.objects.bulk_create(
+        (AuthorStats(user_id=author_id) for author_id in author_ids),
+        ignore_conflicts=True,
+    )
+    AuthorStats.objects.filter(user_id__in=author_ids).update(
+        posts_count=_rows_count(Post, 'author')
+    )
+
+
+def refresh_follower_counts(author_ids):
+    """Пересчёт числа подписчиков указанных авторов одним UPDATE."""
+    AuthorStats.objects.filter(user_id__in=author_ids).update(
+        followers_count=_rows_count(Follow, 'author')
+    )
@@ -0,0 +1,135 @@
+"""Отложенное удаление пользователей и групп.
+
+Сборщик Django загружает все связанные посты в память и удаляет их одной
+транзакцией, на это время SQLite закрыт для записи. Здесь объект сразу
+скрывается с сайта записью DeletionJob, а посты удаляются (у автора) или
+отвязываются (у группы) пачками, каждая в своей транзакции.
+"""
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import bulk
+from .cache import all_feeds, groups_feed, invalidate_feeds
+from .counters import author_posts_count, refresh_follower_counts
+from .models import DeletionJob, Follow, Group, Post, TimelineEntry, User
+from .timeline import restore_fan_out
+
+DELETION_BATCH_SIZE = bulk.BULK_BATCH_SIZE
+
+
+def posts_count(obj):
+    if isinstance(obj, Group):
+        return obj.posts_count
+    return author_posts_count(obj) or 0
+
+
+def _feeds(job):
+    # Посты автора и ссылки на группу есть в любой ленте.
+    if job.kind == DeletionJob.USER:
+        return [all_feeds()]
+    return [all_feeds(), groups_feed()]
+
+
+def _posts(job):
+    field = 'author_id' if job.kind == DeletionJob.USER else 'group_id'
+    return Post.objects.filter(**{field: job.object_id})
+
+
+def _next_ids(queryset, batch_size):
+    # Без сортировки: обработанные строки сами выпадают из выборки.
+    return list(queryset.order_by().values_list('pk', flat=True)[
+        :batch_size
+    ])
+
+
+@transaction.atomic
+def schedule_deletion(obj):
+    """Скрывает пользователя или группу и ставит их посты в очередь.
+
+    Повторный вызов для того же объекта возвращает ту же задачу.
+    """
+    if isinstance(obj, Group):
+        kind, label = DeletionJob.GROUP, obj.slug
+    else:
+        kind, label = DeletionJob.USER, obj.username
+        # Удаляемый пользователь больше не входит на сайт.
+        User.objects.filter(pk=obj.pk).update(is_active=False)
+    job, _ = DeletionJob.objects.pending().get_or_create(
+        kind=kind, object_id=obj.pk,
+        defaults={'label': label, 'total': posts_count(obj)},
+    )
+    invalidate_feeds(_feeds(job))
+    return job
+
+
+def _delete_in_batches(queryset, batch_size):
+    while True:
+        ids = _next_ids(queryset, batch_size)
+        if not ids:
+            return
+        queryset.model.objects.filter(pk__in=ids).delete()
+
+
+def _forget_user(user_id, batch_size):
+    """Лента и подписки пользователя, удаляемые пачками до него самого."""
+    _delete_in_batches(
+        TimelineEntry.objects.filter(user_id=user_id), batch_size
+    )
+    authors = Follow.objects.filter(user_id=user_id).values_list(
+        'author_id', flat=True
+    )
+    for chunk in bulk.chunked(authors, batch_size):
+        Follow.objects.filter(user_id=user_id, author_id__in=chunk).delete()
+        refresh_follower_counts(chunk)
+        restore_fan_out(chunk)
+    _delete_in_batches(Follow.objects.filter(author_id=user_id), batch_size)
+
+
+def _finish(job, batch_size):
+    if job.kind == DeletionJob.USER:
+        _forget_user(job.object_id, batch_size)
+        target = User.objects.filter(pk=job.object_id)
+    else:
+        target = Group.objects.filter(pk=job.object_id)
+    with transaction.atomic():
+        # Связанных постов уже нет, сборщику почти нечего загружать.
+        target.delete()
+        job.finished = timezone.now()
+        job.save(update_fields=['finished'])
+    invalidate_feeds(_feeds(job))
+
+
+def process_job(job, batch_size=DELETION_BATCH_SIZE, pause=0,
+                progress=None):
+    """Удаляет или отвязывает посты задачи пачками, затем сам объект.
+
+    После каждой пачки сохраняет прогресс и вызывает progress(job);
+    pause секунд между пачками оставляет базу другим писателям.
+    """
+    posts = _posts(job)
+    while True:
+        ids = _next_ids(posts, batch_size)
+        if not ids:
+            break
+        if job.kind == DeletionJob.USER:
+            bulk.delete_posts(ids)
+        else:
+            bulk.move_posts(ids, None)
+        job.done += len(ids)
+        job.save(update_fields=['done'])
+        if progress is not None:
+            progress(job)
+        time.sleep(pause)
+    _finish(job, batch_size)
+    return job
+
+
+def process_pending(batch_size=DELETION_BATCH_SIZE, pause=0, progress=None):
+    """Выполняет все незавершённые задачи по порядку, возвращает их число."""
+    done = 0
+    for job in DeletionJob.objects.pending().order_by('pk'):
+        process_job(job, batch_size, pause, progress)
+        done += 1
+    return done
@@ -0,0 +1,74 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Post
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FIELDS = ('id', 'text', 'pub_date', 'author', 'group')
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def parse_day(value):
+    """Дата фильтра из строки YYYY-MM-DD; ValueError для неверной."""
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(f'Неверная дата: {value}')
+    return day
+
+
+def export_queryset(group=None, author=None, since=None, until=None):
+    """Посты для выгрузки в порядке id; since и until включительно."""
+    posts = Post.objects.order_by('pk')
+    if group:
+        posts = posts.filter(group__slug=group)
+    if author:
+        posts = posts.filter(author__username=author)
+    if since:
+        posts = posts.filter(pub_date__gte=_day_start(since))
+    if until:
+        posts = posts.filter(
+            pub_date__lt=_day_start(until + timedelta(days=1))
+        )
+    return posts.values_list(
+        'pk', 'text', 'pub_date', 'author__username', 'group__slug'
+    )
+
+
+def _rows(posts, chunk_size):
+    for pk, text, pub_date, author, group in posts.iterator(
+        chunk_size=chunk_size
+    ):
+        yield pk, text, pub_date.isoformat(), author, group or ''
+
+
+def iter_ndjson(posts, chunk_size=EXPORT_CHUNK_SIZE):
+    for row in _rows(posts, chunk_size):
+        yield json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False)
+        yield '\n'
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def iter_csv(posts, chunk_size=EXPORT_CHUNK_SIZE):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in _rows(posts, chunk_size):
+        yield writer.writerow(row)
+
+
+EXPORT_FORMATS = {
+    'ndjson': (iter_ndjson, 'application/x-ndjson'),
+    'csv': (iter_csv, 'text/csv'),
+}
@@ -1,9 +1,16 @@
 from django import forms
 
-from .models import Post
+from .models import DeletionJob, Group, Post
 
 
 class PostForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Удаляемые группы уже скрыты с сайта.
+        self.fields['group'].queryset = Group.objects.exclude(
+            pk__in=DeletionJob.objects.pending_ids(DeletionJob.GROUP)
+        )
+
     class Meta:
         help_texts = {
             'text': 'Здесь пишут текст поста',
@@ -14,3 +21,9 @@ class PostForm(forms.ModelForm):
             'text',
             'group',
         )
+
+
+class PostImageForm(forms.ModelForm):
+    class Meta:
+        model = Post
+        fields = ('image', )
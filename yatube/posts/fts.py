@@ -0,0 +1,28 @@
+"""DDL полнотекстового индекса постов (SQLite FTS5).
+
+Индекс хранит только токены, сам текст берётся из posts_post
+(external content). Синхронизацию выполняют триггеры. SQLite теряет
+триггеры при пересоздании таблицы, поэтому каждая миграция, меняющая
+posts_post, должна заново создать их. Миграции не импортируют этот
+модуль, а копируют в себя FTS_TRIGGERS, как в 0015_post_image.
+"""
+
+FTS_TABLE = 'posts_post_fts'
+
+FTS_TRIGGERS = (
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad
+    AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+    AFTER UPDATE OF text ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END''',
+)
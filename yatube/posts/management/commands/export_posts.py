@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import (EXPORT_CHUNK_SIZE, EXPORT_FORMATS, export_queryset,
+                          parse_day)
+
+
+class Command(BaseCommand):
+    help = 'Потоково выгружает посты в NDJSON или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', choices=sorted(EXPORT_FORMATS), default='ndjson'
+        )
+        parser.add_argument('--group', help='slug группы')
+        parser.add_argument('--author', help='username автора')
+        parser.add_argument('--since', help='с даты YYYY-MM-DD')
+        parser.add_argument('--until', help='по дату YYYY-MM-DD')
+        parser.add_argument(
+            '--output', help='файл для выгрузки, по умолчанию stdout'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=EXPORT_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        try:
+            posts = export_queryset(
+                group=options['group'],
+                author=options['author'],
+                since=parse_day(options['since']),
+                until=parse_day(options['until']),
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        write_rows, _ = EXPORT_FORMATS[options['format']]
+        chunks = write_rows(posts, options['chunk_size'])
+        if options['output'] is None:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            output.writelines(chunks)
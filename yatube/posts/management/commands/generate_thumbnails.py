@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails, get_executor
+
+CHUNK_SIZE = 100
+
+
+class Command(BaseCommand):
+    help = 'Заранее создаёт миниатюры для всех картинок постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Число процессов, делающих миниатюры',
+        )
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').values_list(
+            'image', flat=True
+        ).iterator(chunk_size=CHUNK_SIZE)
+        start = time.monotonic()
+        done = 0
+        with get_executor(options['workers']) as executor:
+            for done, _ in enumerate(executor.map(
+                generate_thumbnails, names, chunksize=CHUNK_SIZE
+            ), 1):
+                if done % CHUNK_SIZE == 0:
+                    self.stdout.write(f'Обработано картинок: {done}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {done} картинок за {time.monotonic() - start:.1f} с'
+        ))
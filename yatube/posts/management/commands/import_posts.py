@@ -0,0 +1,184 @@
+import csv
+import json
+import os
+import sys
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.bulk import BULK_BATCH_SIZE, bulk_create_posts, finish_bulk_load
+from posts.models import Group, Post
+
+User = get_user_model()
+
+REPORT_INTERVAL = 5
+
+
+def read_ndjson(lines):
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as error:
+            raise CommandError(f'Строка {number}: неверный JSON: {error}')
+
+
+def read_csv(lines):
+    reader = csv.DictReader(lines)
+    try:
+        yield from reader
+    except csv.Error as error:
+        raise CommandError(f'Строка {reader.line_num}: {error}')
+
+
+READERS = {
+    'ndjson': read_ndjson,
+    'csv': read_csv,
+}
+
+
+class LookupMap:
+    """Имя -> id с подгрузкой и созданием недостающих записей пачками."""
+
+    def __init__(self, model, field, make):
+        self.model = model
+        self.field = field
+        self.make = make
+        self.ids = {}
+
+    def resolve(self, names):
+        missing = {name for name in names if name not in self.ids}
+        if not missing:
+            return
+        self._load(missing)
+        new = missing - self.ids.keys()
+        self.model.objects.bulk_create(
+            (self.make(name) for name in new), batch_size=BULK_BATCH_SIZE
+        )
+        self._load(new)
+
+    def _load(self, names):
+        self.ids.update(self.model.objects.filter(
+            **{f'{self.field}__in': names}
+        ).values_list(self.field, 'pk'))
+
+    def __getitem__(self, name):
+        return self.ids[name]
+
+
+def make_user(username):
+    user = User(username=username)
+    user.set_unusable_password()
+    return user
+
+
+def make_group(slug):
+    return Group(title=slug, slug=slug, description='')
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает посты из NDJSON или CSV (поля text, pub_date, author, '
+        'group) пачками bulk_create; авторы и группы создаются по имени'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='файл с данными или - для stdin')
+        parser.add_argument(
+            '--format', choices=sorted(READERS), default='ndjson'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=BULK_BATCH_SIZE,
+            help='строк в одной транзакции',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='файл с числом загруженных строк для продолжения загрузки',
+        )
+
+    def handle(self, *args, **options):
+        self.checkpoint = options['checkpoint']
+        done = self.read_checkpoint()
+        source = (
+            sys.stdin if options['path'] == '-'
+            else open(options['path'], encoding='utf-8', newline='')
+        )
+        records = islice(READERS[options['format']](source), done, None)
+        self.users = LookupMap(User, 'username', make_user)
+        self.groups = LookupMap(Group, 'slug', make_group)
+        start = self.last_report = time.monotonic()
+        imported = 0
+        try:
+            while True:
+                chunk = list(islice(records, options['chunk_size']))
+                if not chunk:
+                    break
+                with transaction.atomic():
+                    self.import_chunk(chunk)
+                imported += len(chunk)
+                self.write_checkpoint(done + imported)
+                self.report(imported, start)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        finish_bulk_load()
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено постов: {imported}, {self.rate(imported, start)}'
+        ))
+
+    def import_chunk(self, chunk):
+        try:
+            self.users.resolve(row['author'] for row in chunk)
+            self.groups.resolve(
+                row['group'] for row in chunk if row.get('group')
+            )
+            bulk_create_posts(self.make_post(row) for row in chunk)
+        except (KeyError, ValueError) as error:
+            raise CommandError(f'Неверная строка данных: {error!r}')
+
+    def make_post(self, row):
+        pub_date = row.get('pub_date')
+        pub_date = parse_datetime(pub_date) if pub_date else timezone.now()
+        if pub_date is None:
+            raise ValueError(row['pub_date'])
+        if timezone.is_naive(pub_date):
+            pub_date = timezone.make_aware(pub_date)
+        group = row.get('group')
+        return Post(
+            text=row['text'],
+            pub_date=pub_date,
+            author_id=self.users[row['author']],
+            group_id=self.groups[group] if group else None,
+        )
+
+    def read_checkpoint(self):
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return 0
+        with open(self.checkpoint) as checkpoint:
+            return int(checkpoint.read().strip() or 0)
+
+    def write_checkpoint(self, done):
+        if not self.checkpoint:
+            return
+        temporary = f'{self.checkpoint}.tmp'
+        with open(temporary, 'w') as checkpoint:
+            checkpoint.write(str(done))
+        os.replace(temporary, self.checkpoint)
+
+    def rate(self, imported, start):
+        elapsed = time.monotonic() - start
+        return f'{imported / elapsed if elapsed else 0:.0f} строк/с'
+
+    def report(self, imported, start):
+        if time.monotonic() - self.last_report < REPORT_INTERVAL:
+            return
+        self.last_report = time.monotonic()
+        self.stdout.write(
+            f'Загружено: {imported}, {self.rate(imported, start)}'
+        )
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.deletion import DELETION_BATCH_SIZE, process_pending
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет пачками посты пользователей и групп, удалённых через '
+        'админку; с --interval работает как фоновый обработчик очереди'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DELETION_BATCH_SIZE,
+            help='постов в одной транзакции',
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='секунд между пачками, чтобы не мешать записи сайта',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='секунд между проверками очереди; 0 — обработать один раз',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным')
+        while True:
+            start = time.monotonic()
+            done = process_pending(
+                options['batch_size'], options['pause'], self.report
+            )
+            if done or not options['interval']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Завершено удалений: {done} за '
+                    f'{time.monotonic() - start:.1f} с'
+                ))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def report(self, job):
+        self.stdout.write(
+            f'{job}: {job.done} из {job.total} постов ({job.progress}%)'
+        )
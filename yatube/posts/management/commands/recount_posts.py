@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import recount_authors, recount_groups
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов групп и авторов'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            groups = recount_groups()
+            authors = recount_authors()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счётчиков групп: {groups}, авторов: {authors}'
+        ))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.cache import all_feeds, bump_feed_version
+from posts.models import Post
+from posts.rendering import backfill
+
+
+class Command(BaseCommand):
+    help = 'Заполняет HTML текста и анонсы постов, у которых их ещё нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true', dest='everything',
+            help='пересчитать все посты, например после смены правил',
+        )
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        done = backfill(Post, everything=options['everything'])
+        if done:
+            # В кеше лент лежат страницы со старыми анонсами.
+            bump_feed_version(all_feeds())
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано постов: {done} за {time.monotonic() - start:.1f} с'
+        ))
@@ -0,0 +1,197 @@
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from faker import Faker
+
+from posts.bulk import BULK_BATCH_SIZE, bulk_create_posts, finish_bulk_load
+from posts.models import Group, Post
+
+User = get_user_model()
+
+VOCABULARY_SIZE = 2000
+WORDS_PER_POST = (5, 60)
+BURST_HOURS = 6
+REPORT_INTERVAL = 5
+
+
+def power_law_weights(count, exponent):
+    """Накопленные веса закона Ципфа: i-й по активности весит 1/i**a."""
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+class DateSampler:
+    """Даты публикаций: равномерный фон и всплески вокруг случайных дней."""
+
+    def __init__(self, rng, end, days, bursts, burst_share):
+        self.rng = rng
+        self.start = end - timedelta(days=days)
+        self.span = days * 24 * 3600
+        self.burst_share = burst_share if bursts else 0
+        self.centers = [rng.uniform(0, self.span) for _ in range(bursts)]
+
+    def __call__(self):
+        if self.rng.random() < self.burst_share:
+            offset = self.rng.gauss(
+                self.rng.choice(self.centers), BURST_HOURS * 3600
+            )
+            offset = min(max(offset, 0), self.span)
+        else:
+            offset = self.rng.uniform(0, self.span)
+        return self.start + timedelta(seconds=offset)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами и постами: '
+        'активность авторов и групп по степенному закону, даты со '
+        'всплесками. Одинаковый --seed даёт одинаковые данные'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='префикс имён пользователей и слагов групп',
+        )
+        parser.add_argument(
+            '--author-exponent', type=float, default=1.1,
+            help='показатель степени для активности авторов',
+        )
+        parser.add_argument(
+            '--group-exponent', type=float, default=1.5,
+            help='показатель степени для популярности групп',
+        )
+        parser.add_argument(
+            '--no-group-share', type=float, default=0.2,
+            help='доля постов без группы',
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument(
+            '--end', default='2022-01-01',
+            help='дата самого позднего поста, YYYY-MM-DD',
+        )
+        parser.add_argument('--bursts', type=int, default=20)
+        parser.add_argument(
+            '--burst-share', type=float, default=0.3,
+            help='доля постов, попадающих во всплески',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BULK_BATCH_SIZE * 10,
+            help='постов в одной транзакции',
+        )
+
+    def handle(self, *args, **options):
+        end = parse_date(options['end'])
+        if end is None:
+            raise CommandError(f'Неверная дата: {options["end"]}')
+        if options['users'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь')
+        self.rng = random.Random(options['seed'])
+        fake = Faker('ru_RU')
+        fake.seed_instance(options['seed'])
+        self.vocabulary = fake.words(nb=VOCABULARY_SIZE)
+        prefix = options['prefix']
+        authors = self.create_users(prefix, options['users'])
+        groups = self.create_groups(prefix, options['groups'], fake)
+        self.sample_date = DateSampler(
+            self.rng,
+            datetime.combine(end, datetime.min.time(), tzinfo=timezone.utc),
+            options['days'], options['bursts'], options['burst_share'],
+        )
+        self.author_weights = power_law_weights(
+            len(authors), options['author_exponent']
+        )
+        self.group_weights = power_law_weights(
+            len(groups), options['group_exponent']
+        )
+        self.create_posts(
+            options['posts'], authors, groups, options['no_group_share'],
+            options['batch_size'],
+        )
+        finish_bulk_load()
+
+    def create_users(self, prefix, count):
+        names = [f'{prefix}_user_{i}' for i in range(count)]
+        users = []
+        for name in names:
+            user = User(username=name)
+            user.set_unusable_password()
+            users.append(user)
+        User.objects.bulk_create(
+            users, batch_size=BULK_BATCH_SIZE, ignore_conflicts=True
+        )
+        ids = dict(User.objects.filter(
+            username__in=names
+        ).values_list('username', 'pk'))
+        return [ids[name] for name in names]
+
+    def create_groups(self, prefix, count, fake):
+        slugs = [f'{prefix}-group-{i}' for i in range(count)]
+        Group.objects.bulk_create(
+            (
+                Group(
+                    title=fake.sentence(nb_words=3)[:200],
+                    slug=slug,
+                    description=fake.paragraph(),
+                )
+                for slug in slugs
+            ),
+            batch_size=BULK_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        ids = dict(Group.objects.filter(
+            slug__in=slugs
+        ).values_list('slug', 'pk'))
+        return [ids[slug] for slug in slugs]
+
+    def make_posts(self, count, authors, groups, no_group_share):
+        rng = self.rng
+        author_ids = rng.choices(
+            authors, cum_weights=self.author_weights, k=count
+        )
+        for author_id in author_ids:
+            group_id = None
+            if groups and rng.random() >= no_group_share:
+                group_id = rng.choices(
+                    groups, cum_weights=self.group_weights
+                )[0]
+            words = rng.choices(
+                self.vocabulary, k=rng.randint(*WORDS_PER_POST)
+            )
+            yield Post(
+                text=' '.join(words).capitalize() + '.',
+                pub_date=self.sample_date(),
+                author_id=author_id,
+                group_id=group_id,
+            )
+
+    def create_posts(self, total, authors, groups, no_group_share, batch):
+        start = last_report = time.monotonic()
+        created = 0
+        while created < total:
+            count = min(batch, total - created)
+            with transaction.atomic():
+                bulk_create_posts(
+                    self.make_posts(count, authors, groups, no_group_share)
+                )
+            created += count
+            if time.monotonic() - last_report >= REPORT_INTERVAL:
+                last_report = time.monotonic()
+                self.stdout.write(f'Создано постов: {created} из {total}')
+        elapsed = time.monotonic() - start
+        rate = created / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано постов: {created}, {rate:.0f} строк/с'
+        ))
@@ -0,0 +1,85 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:17
+
+import unicodedata
+
+from django.db import migrations, models
+from django.template.defaultfilters import linebreaksbr
+from django.utils.text import Truncator
+
+# Триггеры FTS и заполнение полей скопированы из posts.fts и
+# posts.rendering на момент миграции: изменения в приложении не должны
+# менять уже применённые миграции.
+FTS_TABLE = 'posts_post_fts'
+
+FTS_TRIGGERS = (
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad
+    AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+    AFTER UPDATE OF text ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END''',
+)
+
+
+def create_fts_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in FTS_TRIGGERS:
+        schema_editor.execute(sql)
+
+
+EXCERPT_LENGTH = 300
+EXCERPT_ELLIPSIS = '…'
+BACKFILL_BATCH_SIZE = 500
+
+
+def render_posts(apps, schema_editor):
+    """HTML и анонс уже сохранённых постов, пачками по pk."""
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.order_by('pk').only('pk', 'text')
+    posts = posts.filter(text_html='').exclude(text='')
+    last_pk = 0
+    while True:
+        batch = list(posts.filter(pk__gt=last_pk)[:BACKFILL_BATCH_SIZE])
+        if not batch:
+            return
+        for post in batch:
+            post.text_html = linebreaksbr(post.text, autoescape=True)
+            text = unicodedata.normalize('NFC', post.text)
+            post.excerpt = Truncator(text).chars(
+                EXCERPT_LENGTH, truncate=EXCERPT_ELLIPSIS
+            )
+        Post.objects.bulk_update(batch, ['text_html', 'excerpt'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=300, verbose_name='Анонс'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='Текст в HTML'),
+        ),
+        # AddField пересоздаёт posts_post, триггеры FTS нужно вернуть.
+        migrations.RunPython(create_fts_triggers, migrations.RunPython.noop),
+        migrations.RunPython(render_posts, migrations.RunPython.noop),
+    ]
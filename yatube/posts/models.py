@@ -1,8 +1,32 @@
+from datetime import datetime, time, timedelta
+
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Exists, Min, OuterRef
+from django.utils import timezone
+
+from .rendering import EXCERPT_LENGTH, make_excerpt, render_text_html
 
 User = get_user_model()
 
+SEEK_DATE_KINDS = ('year', 'month', 'day')
+
+
+def _period_start(day, kind):
+    if kind == 'year':
+        return day.replace(month=1, day=1)
+    if kind == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _next_period(day, kind):
+    if kind == 'year':
+        return day.replace(year=day.year + 1)
+    if kind == 'month':
+        return (day + timedelta(days=31)).replace(day=1)
+    return day + timedelta(days=1)
+
 
 class Group(models.Model):
     title = models.CharField(
@@ -15,6 +39,11 @@ class Group(models.Model):
         verbose_name='Указатель',
     )
     description = models.TextField(verbose_name='Описание')
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество постов',
+    )
 
     class Meta:
         verbose_name = 'Группа'
@@ -24,6 +53,83 @@ class Group(models.Model):
         return self.title
 
 
+class AuthorStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Автор',
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество постов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписчиков',
+    )
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+    def __str__(self) -> str:
+        return f'{self.user}: {self.posts_count}'
+
+
+def hidden_group(group_field='group_id'):
+    """Признак group_hidden: группа поста ждёт удаления, и ссылка на неё
+    уже отвечает 404."""
+    return Exists(DeletionJob.objects.pending().filter(
+        kind=DeletionJob.GROUP, object_id=OuterRef(group_field)
+    ))
+
+
+class PostQuerySet(models.QuerySet):
+    def visible(self):
+        """Посты без тех, чьи авторы ждут удаления.
+
+        Без аннотаций: такой выборкой и считают посты ленты.
+        """
+        return self.exclude(
+            author_id__in=DeletionJob.objects.pending_ids(DeletionJob.USER)
+        )
+
+    def feed(self):
+        # Ленты показывают анонс, полный текст нужен только странице поста.
+        return self.visible().select_related('author', 'group').defer(
+            'text', 'text_html'
+        ).annotate(group_hidden=hidden_group())
+
+    def seek_dates(self, field_name, kind, order='ASC'):
+        """Список периодов, как у dates(), поиском по индексу: по запросу
+        MIN на каждый найденный период вместо усечения даты в каждой строке
+        таблицы.
+
+        Так date_hierarchy админки не читает всю таблицу.
+        """
+        if field_name != 'pub_date' or kind not in SEEK_DATE_KINDS:
+            return list(self.dates(field_name, kind, order))
+        queryset = self.order_by()
+        periods = []
+        first = queryset.aggregate(first=Min('pub_date'))['first']
+        while first is not None:
+            if timezone.is_aware(first):
+                first = timezone.localtime(first)
+            period = _period_start(first.date(), kind)
+            periods.append(period)
+            start = datetime.combine(_next_period(period, kind), time.min)
+            if timezone.is_aware(first):
+                start = timezone.make_aware(start)
+            first = queryset.filter(pub_date__gte=start).aggregate(
+                first=Min('pub_date')
+            )['first']
+        if order == 'DESC':
+            periods.reverse()
+        return periods
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Текст поста',
@@ -48,11 +154,206 @@ class Post(models.Model):
         verbose_name='Группа',
         help_text='Группа, к которой будет относиться пост'
     )
+    image = models.ImageField(
+        'Картинка',
+        upload_to='posts/',
+        blank=True
+    )
+    text_html = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='Текст в HTML',
+    )
+    excerpt = models.CharField(
+        max_length=EXCERPT_LENGTH,
+        blank=True,
+        editable=False,
+        verbose_name='Анонс',
+    )
+    is_truncated = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Анонс обрезан',
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
-        ordering = ('-pub_date', )
+        ordering = ('-pub_date', '-id')
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='post_feed_idx',
+            ),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_feed_idx',
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_feed_idx',
+            ),
+        )
 
     def __str__(self) -> str:
         return self.text[:15]
+
+    def render_text(self):
+        """Считает text_html, excerpt и is_truncated из текущего text."""
+        self.text_html = render_text_html(self.text)
+        self.excerpt, self.is_truncated = make_excerpt(self.text)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'text' in update_fields:
+            self.render_text()
+            if update_fields is not None:
+                kwargs['update_fields'] = {
+                    *update_fields, 'text_html', 'excerpt', 'is_truncated'
+                }
+        # Счётчики обновляются в post_save и должны попасть в ту же
+        # транзакцию, что и сам пост.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
+class Follow(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follower',
+        verbose_name='Подписчик',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='following',
+        verbose_name='Автор',
+    )
+
+    class Meta:
+        verbose_name = 'Подписка'
+        verbose_name_plural = 'Подписки'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='unique_follow',
+            ),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='no_self_follow',
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f'{self.user} -> {self.author}'
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+        ordering = ('-pub_date', '-post')
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_timeline_entry',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='timeline_user_feed_idx',
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f'{self.user}: {self.post}'
+
+
+class DeletionJobQuerySet(models.QuerySet):
+    def pending(self):
+        return self.filter(finished__isnull=True)
+
+    def pending_ids(self, kind):
+        """Подзапрос id удаляемых объектов: они уже скрыты с сайта."""
+        return self.pending().filter(kind=kind).values('object_id')
+
+
+class DeletionJob(models.Model):
+    """Отложенное удаление пользователя или группы.
+
+    Запись сразу скрывает объект с сайта, а посты удаляет или отвязывает
+    пачками команда process_deletions.
+    """
+    USER = 'user'
+    GROUP = 'group'
+    KINDS = (
+        (USER, 'Пользователь'),
+        (GROUP, 'Группа'),
+    )
+
+    kind = models.CharField(
+        max_length=10,
+        choices=KINDS,
+        verbose_name='Что удаляется',
+    )
+    object_id = models.PositiveIntegerField(verbose_name='ID объекта')
+    label = models.CharField(max_length=150, verbose_name='Объект')
+    total = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Постов всего',
+    )
+    done = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Постов обработано',
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создано',
+    )
+    finished = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Завершено',
+    )
+
+    objects = DeletionJobQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Удаление'
+        verbose_name_plural = 'Удаления'
+        ordering = ('-id',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('kind', 'object_id'),
+                condition=models.Q(finished__isnull=True),
+                name='unique_pending_deletion',
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f'{self.get_kind_display()} {self.label}'
+
+    @property
+    def progress(self):
+        if not self.total:
+            return 100 if self.finished else 0
+        return min(100, self.done * 100 // self.total)
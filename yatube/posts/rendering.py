@@ -0,0 +1,50 @@
+"""HTML текста поста и короткий анонс, которые считаются один раз при
+записи, а не фильтрами шаблона на каждом показе."""
+import unicodedata
+
+from django.template.defaultfilters import linebreaksbr
+from django.utils.text import Truncator
+
+EXCERPT_LENGTH = 300
+EXCERPT_ELLIPSIS = '…'
+BACKFILL_BATCH_SIZE = 500
+
+
+def render_text_html(text):
+    return linebreaksbr(text, autoescape=True)
+
+
+def make_excerpt(text):
+    """Анонс и признак того, что текст в него не поместился.
+
+    Truncator сравнивает длину NFC-формы текста, с ней и сверяемся: текст,
+    сам оканчивающийся на многоточие, обрезанным не считается.
+    """
+    text = unicodedata.normalize('NFC', text)
+    excerpt = Truncator(text).chars(EXCERPT_LENGTH, truncate=EXCERPT_ELLIPSIS)
+    return excerpt, excerpt != text
+
+
+def backfill(model, everything=False, batch_size=BACKFILL_BATCH_SIZE):
+    """Заполняет text_html, excerpt и is_truncated пачками по pk,
+    возвращает число строк.
+
+    Принимает модель, чтобы работать и с историческими моделями миграций.
+    """
+    posts = model.objects.order_by('pk').only('pk', 'text')
+    if not everything:
+        posts = posts.filter(text_html='').exclude(text='')
+    last_pk = 0
+    done = 0
+    while True:
+        batch = list(posts.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return done
+        for post in batch:
+            post.text_html = render_text_html(post.text)
+            post.excerpt, post.is_truncated = make_excerpt(post.text)
+        model.objects.bulk_update(
+            batch, ['text_html', 'excerpt', 'is_truncated']
+        )
+        last_pk = batch[-1].pk
+        done += len(batch)
@@ -0,0 +1,78 @@
+from django.db import connection
+
+from .fts import FTS_TABLE
+from .models import Post
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    """Запрос пользователя в синтаксис FTS5: префиксный поиск по словам.
+
+    Каждое слово берётся в кавычки, поэтому операторы FTS5 в тексте
+    запроса не ломают разбор.
+    """
+    words = (word.replace('"', '""') for word in query.split())
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def filter_posts(queryset, query):
+    """Посты queryset, подходящие под запрос, через индекс FTS5."""
+    if not fts_available():
+        return queryset.filter(text__icontains=query)
+    # pk__in=RawSQL(...) даёт IN ((SELECT ...)), и SQLite сравнивает id
+    # только с первой строкой подзапроса.
+    table = queryset.model._meta.db_table
+    return queryset.extra(
+        where=[
+            f'"{table}"."id" IN (SELECT rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s)'
+        ],
+        params=[match_expression(query)],
+    )
+
+
+class SearchResults:
+    """Ленивая выдача поиска для Paginator: COUNT и срезы по рангу FTS5."""
+
+    def __init__(self, query):
+        self.query = query.strip()
+        self.match = match_expression(self.query)
+
+    def _fallback(self):
+        return filter_posts(Post.objects.feed(), self.query)
+
+    def count(self):
+        if not self.query:
+            return 0
+        if not fts_available():
+            return self._fallback().count()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                (self.match,)
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if not self.query:
+            return []
+        if not fts_available():
+            return list(self._fallback()[index])
+        start = index.start or 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY rank LIMIT %s OFFSET %s',
+                (self.match, index.stop - start, start)
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = Post.objects.feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
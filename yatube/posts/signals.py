@@ -0,0 +1,88 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .cache import (author_feed, group_feed, groups_feed, index_feed,
+                    invalidate_feeds)
+from .counters import change_author_count, change_group_count
+from .models import Group, Post, User
+from .thumbnails import schedule_thumbnails
+
+
+def _post_feeds(post, moved=False):
+    group_ids = {post.group_id}
+    feeds = [index_feed(), author_feed(post.author.username)]
+    if moved:
+        group_ids.add(post._loaded_group_id)
+        if post._loaded_author_id != post.author_id:
+            feeds.extend(
+                author_feed(username) for username in User.objects.filter(
+                    pk=post._loaded_author_id
+                ).values_list('username', flat=True)
+            )
+    slugs = Group.objects.filter(
+        pk__in=group_ids - {None}
+    ).values_list('slug', flat=True)
+    feeds.extend(group_feed(slug) for slug in slugs)
+    return feeds
+
+
+def _remember_relations(post):
+    # Через __dict__, чтобы не подгружать отложенные (.only) поля.
+    post._loaded_author_id = post.__dict__.get('author_id')
+    post._loaded_group_id = post.__dict__.get('group_id')
+    image = post.__dict__.get('image')
+    post._loaded_image = getattr(image, 'name', image)
+
+
+@receiver(post_init, sender=Post)
+def remember_relations(sender, instance, **kwargs):
+    _remember_relations(instance)
+
+
+@receiver(post_save, sender=Post)
+def update_counters_on_save(sender, instance, created, **kwargs):
+    if created:
+        change_author_count(instance.author_id, 1)
+        change_group_count(instance.group_id, 1)
+        return
+    if instance.author_id != instance._loaded_author_id:
+        change_author_count(instance._loaded_author_id, -1)
+        change_author_count(instance.author_id, 1)
+    if instance.group_id != instance._loaded_group_id:
+        change_group_count(instance._loaded_group_id, -1)
+        change_group_count(instance.group_id, 1)
+
+
+@receiver(post_save, sender=Post)
+def make_thumbnails_on_upload(sender, instance, **kwargs):
+    name = instance.image.name
+    if name and name != instance._loaded_image:
+        transaction.on_commit(lambda: schedule_thumbnails(name))
+
+
+@receiver(post_save, sender=Post)
+def invalidate_on_save(sender, instance, created, **kwargs):
+    invalidate_feeds(_post_feeds(instance, moved=not created))
+    _remember_relations(instance)
+
+
+@receiver(post_delete, sender=Post)
+def update_counters_on_delete(sender, instance, **kwargs):
+    change_author_count(instance.author_id, -1)
+    change_group_count(instance.group_id, -1)
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_on_delete(sender, instance, **kwargs):
+    invalidate_feeds(_post_feeds(instance))
+
+
+@receiver(post_save, sender=Group)
+def invalidate_on_group_save(sender, instance, **kwargs):
+    invalidate_feeds([groups_feed()])
+
+
+@receiver(post_delete, sender=Group)
+def invalidate_on_group_delete(sender, instance, **kwargs):
+    invalidate_feeds([index_feed(), groups_feed(), group_feed(instance.slug)])
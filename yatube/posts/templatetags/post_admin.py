@@ -0,0 +1,33 @@
+import copy
+
+from django import template
+from django.contrib.admin.templatetags.admin_list import date_hierarchy
+
+from core.query_budget import expected_repeats
+
+register = template.Library()
+
+
+class SeekDates:
+    """queryset списка для date_hierarchy: периоды берутся из seek_dates()
+    вместо dates() с усечением даты в каждой строке."""
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    def aggregate(self, *args, **kwargs):
+        return self.queryset.aggregate(*args, **kwargs)
+
+    def dates(self, field_name, kind):
+        # Запрос на каждый найденный период, их не больше числа лет,
+        # месяцев или дней в выборке: это не N+1 по строкам.
+        with expected_repeats():
+            return self.queryset.seek_dates(field_name, kind)
+
+
+@register.inclusion_tag('admin/date_hierarchy.html')
+def seek_date_hierarchy(cl):
+    """date_hierarchy админки с поиском периодов по индексу."""
+    cl = copy.copy(cl)
+    cl.queryset = SeekDates(cl.queryset)
+    return date_hierarchy(cl)
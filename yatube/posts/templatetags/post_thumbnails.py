@@ -0,0 +1,12 @@
+from django import template
+
+from posts.thumbnails import cached_thumbnail
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image, geometry):
+    """Миниатюра из THUMBNAIL_SIZES, если она уже создана, иначе None:
+    страница не ждёт пул процессов миниатюр."""
+    return cached_thumbnail(image, geometry)
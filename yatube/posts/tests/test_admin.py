@@ -0,0 +1,254 @@
+from datetime import datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..cache import get_feed_version, group_feed
+from ..deletion import schedule_deletion
+from ..models import AuthorStats, Group, Post, TimelineEntry
+from ..timeline import fan_out_post, follow_author
+
+User = get_user_model()
+
+
+class PostAdminTest(TestCase):
+    """Список постов в админке без запросов на каждую строку"""
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {i}', slug=f'group-{i}', description=''
+            )
+            for i in range(3)
+        ]
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user,
+                text=f'Пушкин пост {i}',
+                group=cls.groups[i % 3],
+            )
+            for i in range(12)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.admin_client = Client()
+        self.admin_client.force_login(
+            User.objects.create_superuser('admin', 'admin@ya.ru', 'pass')
+        )
+        self.url = reverse('admin:posts_post_changelist')
+
+    def test_changelist_has_no_per_row_queries(self):
+        self.admin_client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.admin_client.get(self.url)
+        sql = [query['sql'] for query in queries.captured_queries]
+        self.assertFalse([query for query in sql if 'COUNT(' in query])
+        self.assertFalse([
+            query for query in sql if query.startswith(
+                'SELECT "posts_group"'
+            )
+        ])
+        self.assertEqual(response.context['cl'].result_count, 12)
+        self.assertContains(response, 'vForeignKeyRawIdAdminField', count=12)
+        self.assertContains(response, 'Группа 1')
+
+    def test_total_count_separate_from_index_feed(self):
+        hidden = User.objects.create_user(username='hidden')
+        Post.objects.create(author=hidden, text='Скрытый пост')
+        schedule_deletion(hidden)
+        self.assertEqual(
+            self.admin_client.get(self.url).context['cl'].result_count, 13
+        )
+        response = Client().get(reverse('posts:main'))
+        self.assertEqual(response.context['page_obj'].paginator.count, 12)
+
+    @override_settings(ADMIN_COUNT_LIMIT=5)
+    def test_filtered_count_is_capped(self):
+        response = self.admin_client.get(self.url, {'q': 'пушкин'})
+        self.assertEqual(response.context['cl'].result_count, 5)
+        self.assertContains(response, '≥5 Посты')
+
+    def test_list_editable_changes_group(self):
+        post = PostAdminTest.posts[0]
+        response = self.admin_client.get(self.url)
+        formset = response.context['cl'].formset
+        data = {
+            'form-TOTAL_FORMS': formset.total_form_count(),
+            'form-INITIAL_FORMS': formset.initial_form_count(),
+            '_save': 'Сохранить',
+        }
+        for index, form in enumerate(formset.forms):
+            data[f'form-{index}-id'] = form.instance.pk
+            data[f'form-{index}-group'] = form.instance.group_id
+            if form.instance == post:
+                data[f'form-{index}-group'] = PostAdminTest.groups[2].pk
+        self.admin_client.post(self.url, data)
+        post.refresh_from_db()
+        self.assertEqual(post.group, PostAdminTest.groups[2])
+
+    def test_date_hierarchy_periods_match_default_dates(self):
+        start = timezone.make_aware(datetime(2020, 12, 30, 23))
+        for index, post in enumerate(PostAdminTest.posts):
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=start + timedelta(days=index * 20)
+            )
+        posts = Post.objects.all()
+        for kind in ('year', 'month', 'day'):
+            for order in ('ASC', 'DESC'):
+                with self.subTest(kind=kind, order=order):
+                    self.assertEqual(
+                        posts.seek_dates('pub_date', kind, order),
+                        list(posts.dates('pub_date', kind, order)),
+                    )
+        response = self.admin_client.get(
+            self.url, {'pub_date__year': 2021}
+        )
+        self.assertContains(response, 'pub_date__month=7')
+
+
+class PostBulkActionsTest(TestCase):
+    """Массовые действия над постами в админке"""
+    def setUp(self):
+        cache.clear()
+        self.first = User.objects.create_user(username='first')
+        self.second = User.objects.create_user(username='second')
+        self.reader = User.objects.create_user(username='reader')
+        follow_author(self.reader, self.first)
+        self.old_group = Group.objects.create(
+            title='Старая', slug='old', description=''
+        )
+        self.new_group = Group.objects.create(
+            title='Новая', slug='new', description=''
+        )
+        self.posts = []
+        for i in range(4):
+            post = Post.objects.create(
+                author=self.first, text=f'Пост {i}', group=self.old_group
+            )
+            fan_out_post(post)
+            self.posts.append(post)
+        Post.objects.create(author=self.second, text='Чужой пост')
+        self.admin_client = Client()
+        self.admin_client.force_login(
+            User.objects.create_superuser('admin', 'admin@ya.ru', 'pass')
+        )
+
+    def run_action(self, action, model='post', **data):
+        return self.admin_client.post(
+            reverse(f'admin:posts_{model}_changelist'),
+            {
+                'action': action,
+                'index': 0,
+                '_selected_action': [post.pk for post in self.posts],
+                **data,
+            },
+            follow=True,
+        )
+
+    def counts(self):
+        self.old_group.refresh_from_db()
+        self.new_group.refresh_from_db()
+        return (
+            self.old_group.posts_count,
+            self.new_group.posts_count,
+            AuthorStats.objects.get(user=self.first).posts_count,
+            AuthorStats.objects.get(user=self.second).posts_count,
+        )
+
+    def test_move_posts_to_group(self):
+        version = get_feed_version(group_feed('old'))
+        response = self.run_action('move_posts_to_group', group='new')
+        self.assertContains(response, 'Перенесено постов в «Новая»: 4 за')
+        self.assertEqual(self.new_group.posts.count(), 4)
+        self.assertEqual(self.counts(), (0, 4, 4, 1))
+        self.assertNotEqual(get_feed_version(group_feed('old')), version)
+
+        response = self.run_action('move_posts_to_group', group='missing')
+        self.assertContains(response, 'Не найдено: Группа «missing»')
+
+    def test_reassign_posts_rebuilds_timelines(self):
+        other_reader = User.objects.create_user(username='other')
+        follow_author(other_reader, self.second)
+        self.run_action('reassign_posts', author='second')
+        self.assertEqual(self.second.posts.count(), 5)
+        self.assertEqual(self.counts(), (4, 0, 0, 5))
+        self.assertFalse(self.reader.timeline.exists())
+        self.assertEqual(other_reader.timeline.count(), 5)
+
+    def test_delete_posts_asks_confirmation(self):
+        response = self.run_action('delete_posts')
+        self.assertContains(response, 'Будет удалено постов: 4')
+        self.assertEqual(Post.objects.count(), 5)
+
+        response = self.run_action('delete_posts', confirm=1)
+        self.assertContains(response, 'Удалено постов: 4 за')
+        self.assertEqual(list(Post.objects.values_list('text', flat=True)),
+                         ['Чужой пост'])
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.counts(), (0, 0, 0, 1))
+
+    def test_delete_posts_clears_every_relation(self):
+        # delete_posts удаляет без Collector: все модели, ссылающиеся
+        # на Post, он должен чистить сам.
+        self.assertEqual(
+            [rel.related_model for rel in Post._meta.related_objects],
+            [TimelineEntry]
+        )
+
+    def test_group_actions_work_on_posts_of_groups(self):
+        response = self.admin_client.post(
+            reverse('admin:posts_group_changelist'),
+            {
+                'action': 'move_posts_to_group',
+                'index': 0,
+                '_selected_action': [self.old_group.pk],
+                'group': 'new',
+            },
+            follow=True,
+        )
+        self.assertContains(response, 'Перенесено постов в «Новая»: 4 за')
+        self.assertEqual(self.counts(), (0, 4, 4, 1))
+
+    def test_default_delete_action_is_replaced(self):
+        response = self.admin_client.get(
+            reverse('admin:posts_post_changelist')
+        )
+        actions = dict(response.context['action_form'].fields[
+            'action'
+        ].choices)
+        self.assertNotIn('delete_selected', actions)
+        self.assertIn('delete_posts', actions)
+
+    def test_group_actions_need_post_permissions(self):
+        editor = User.objects.create_user('editor', is_staff=True)
+        editor.user_permissions.set(Permission.objects.filter(
+            codename__in=('view_group', 'change_group', 'delete_group')
+        ))
+        editor_client = Client()
+        editor_client.force_login(editor)
+        url = reverse('admin:posts_group_changelist')
+        actions = dict(editor_client.get(url).context['action_form'].fields[
+            'action'
+        ].choices)
+        self.assertNotIn('move_posts_to_group', actions)
+        self.assertNotIn('delete_posts', actions)
+
+        editor.user_permissions.add(
+            Permission.objects.get(codename='change_post')
+        )
+        editor = User.objects.get(pk=editor.pk)
+        editor_client.force_login(editor)
+        actions = dict(editor_client.get(url).context['action_form'].fields[
+            'action'
+        ].choices)
+        self.assertIn('move_posts_to_group', actions)
+        self.assertNotIn('delete_posts', actions)
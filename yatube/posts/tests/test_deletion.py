@@ -0,0 +1,145 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..deletion import schedule_deletion
+from ..forms import PostForm
+from ..models import AuthorStats, DeletionJob, Group, Post, TimelineEntry
+from ..timeline import fan_out_post, follow_author
+
+User = get_user_model()
+
+
+class DeletionJobTest(TestCase):
+    """Отложенное удаление пользователей и групп"""
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.other = User.objects.create_user(username='other')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description=''
+        )
+        follow_author(self.reader, self.author)
+        follow_author(self.author, self.other)
+        for i in range(5):
+            fan_out_post(Post.objects.create(
+                author=self.author, text=f'Пост {i}', group=self.group
+            ))
+        Post.objects.create(author=self.other, text='Пост в группе',
+                            group=self.group)
+        self.guest_client = Client()
+
+    def process(self):
+        output = StringIO()
+        call_command('process_deletions', batch_size=2, stdout=output)
+        return output.getvalue()
+
+    def test_scheduled_user_hidden_at_once(self):
+        job = schedule_deletion(self.author)
+        self.assertEqual(job.total, 5)
+        self.assertEqual(schedule_deletion(self.author), job)
+        self.author.refresh_from_db()
+        self.assertFalse(self.author.is_active)
+        self.assertEqual(Post.objects.filter(author=self.author).count(), 5)
+        response = self.guest_client.get(
+            reverse('posts:profile', kwargs={'username': 'author'})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_scheduled_user_posts_hidden_everywhere(self):
+        post = Post.objects.filter(author=self.author).first()
+        self.guest_client.get(reverse('posts:main'))
+        schedule_deletion(self.author)
+        pages = (
+            reverse('posts:main'),
+            reverse('posts:group', kwargs={'slug': 'group'}),
+            reverse('posts:search') + '?q=Пост',
+        )
+        for url in pages:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertNotContains(response, 'Пост 1')
+                self.assertContains(response, 'Пост в группе')
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        self.assertEqual(response.status_code, 404)
+        self.other.set_password('pass')
+        self.other.save()
+        self.assertTrue(self.client.login(username='other', password='pass'))
+        follow_author(self.other, self.author)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertNotContains(response, 'Пост 1')
+
+    def test_group_pages_count_only_visible_posts(self):
+        for i in range(10):
+            Post.objects.create(author=self.other, text=f'Ещё {i}',
+                                group=self.group)
+        url = reverse('posts:group', kwargs={'slug': 'group'})
+        self.assertEqual(
+            self.guest_client.get(url).context['page_obj'].paginator.count,
+            16,
+        )
+        schedule_deletion(self.author)
+        page_obj = self.guest_client.get(url).context['page_obj']
+        self.assertEqual(page_obj.paginator.count, 11)
+        self.assertEqual(page_obj.paginator.num_pages, 2)
+
+    def test_scheduled_group_not_linked_or_offered(self):
+        schedule_deletion(self.group)
+        group_url = reverse('posts:group', kwargs={'slug': 'group'})
+        response = self.guest_client.get(reverse('posts:main'))
+        self.assertContains(response, 'Пост в группе')
+        self.assertNotContains(response, group_url)
+        self.assertNotContains(response, 'все записи группы')
+        self.assertFalse(
+            PostForm().fields['group'].queryset.filter(
+                pk=self.group.pk
+            ).exists()
+        )
+
+    def test_user_posts_deleted_in_batches(self):
+        job = schedule_deletion(self.author)
+        output = self.process()
+        self.assertIn('Пользователь author: 2 из 5 постов (40%)', output)
+        self.assertIn('Завершено удалений: 1', output)
+        job.refresh_from_db()
+        self.assertEqual(job.done, 5)
+        self.assertIsNotNone(job.finished)
+        self.assertFalse(User.objects.filter(username='author').exists())
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        stats = AuthorStats.objects.get(user=self.other)
+        self.assertEqual(stats.followers_count, 0)
+
+    def test_group_posts_detached_in_batches(self):
+        schedule_deletion(self.group)
+        response = self.guest_client.get(
+            reverse('posts:group', kwargs={'slug': 'group'})
+        )
+        self.assertEqual(response.status_code, 404)
+        self.process()
+        self.assertFalse(Group.objects.exists())
+        self.assertEqual(Post.objects.filter(group=None).count(), 6)
+        self.assertFalse(DeletionJob.objects.pending().exists())
+
+    def test_admin_delete_schedules_job(self):
+        admin_client = Client()
+        admin_client.force_login(
+            User.objects.create_superuser('admin', 'admin@ya.ru', 'pass')
+        )
+        url = reverse('admin:posts_group_delete', args=(self.group.pk,))
+        response = admin_client.get(url)
+        self.assertContains(response, 'Группа: постов 6, удалятся в фоне')
+        admin_client.post(url, {'post': 'yes'})
+        self.assertTrue(Group.objects.filter(pk=self.group.pk).exists())
+        job = DeletionJob.objects.get()
+        self.assertEqual((job.kind, job.label), (DeletionJob.GROUP, 'group'))
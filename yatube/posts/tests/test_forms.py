@@ -1,18 +1,35 @@
 import shutil
 import tempfile
 from http import HTTPStatus
+from unittest import mock
 
-from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase, override_settings
+from django.core.files.storage import default_storage
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from ..forms import PostForm
 from ..models import Group, Post
+from ..thumbnails import (THUMBNAIL_SIZES, cached_thumbnail,
+                          generate_thumbnails)
 
 User = get_user_model()
 
-TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -71,6 +88,29 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(post.author, PostCreateFormTests.post.author)
         self.assertEqual(post.group, PostCreateFormTests.group)
 
+    def test_create_post_with_image(self):
+        uploaded = SimpleUploadedFile(
+            name='small.gif',
+            content=SMALL_GIF,
+            content_type='image/gif'
+        )
+        self.author_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с картинкой',
+                'image': uploaded,
+            },
+            follow=True
+        )
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertEqual(post.image.name, 'posts/small.gif')
+
+        thumbnails = generate_thumbnails(post.image.name)
+        self.assertEqual(len(thumbnails), len(THUMBNAIL_SIZES))
+        for name in thumbnails:
+            with self.subTest(name=name):
+                self.assertTrue(default_storage.exists(name))
+
     def test_post_edit(self):
         post_count = Post.objects.count()
         post = Post.objects.create(
@@ -117,3 +157,60 @@ class PostCreateFormTests(TestCase):
             response,
             '/auth/login/?next=/create/'
         )
+
+
+# Без пула миниатюры создаются в самом запросе, это сверх бюджета
+# post_create.
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    POSTS_THUMBNAIL_WORKERS=0,
+    QUERY_BUDGET_ENABLED=False,
+)
+class ThumbnailScheduleTest(TransactionTestCase):
+    """Миниатюры создаются после коммита, шаблоны их только читают"""
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username='auth')
+        self.client.force_login(self.user)
+        self.profile_url = reverse(
+            'posts:profile', kwargs={'username': 'auth'}
+        )
+
+    def create_post(self):
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(
+                'small.gif', SMALL_GIF, content_type='image/gif'
+            ),
+        })
+        return Post.objects.get(text='Пост с картинкой')
+
+    def test_thumbnails_made_on_commit_and_only_read_by_templates(self):
+        post = self.create_post()
+        thumbnail = cached_thumbnail(post.image, '800x600')
+        self.assertIsNotNone(thumbnail)
+        self.assertIn(thumbnail.name, generate_thumbnails(post.image.name))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.profile_url)
+        self.assertContains(response, thumbnail.url)
+        self.assertFalse(any(
+            'thumbnail_kvstore' in query['sql'] for query in queries
+        ))
+
+    def test_upload_submitted_to_pool(self):
+        with override_settings(POSTS_THUMBNAIL_WORKERS=2), mock.patch(
+            'posts.thumbnails.get_executor'
+        ) as get_executor:
+            post = self.create_post()
+        get_executor.return_value.submit.assert_called_once_with(
+            generate_thumbnails, post.image.name
+        )
+        self.assertIsNone(cached_thumbnail(post.image, '800x600'))
+        response = self.client.get(self.profile_url)
+        self.assertContains(response, post.image.url)
@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.metrics import TOTALS_FILE, registry
+
+from ..models import Post
+
+User = get_user_model()
+
+METRICS_DIR = tempfile.mkdtemp()
+
+
+@override_settings(METRICS_DIR=METRICS_DIR)
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+        self.guest_client = Client()
+
+    def metrics(self):
+        response = self.guest_client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode().splitlines()
+
+    def test_view_metrics_are_exposed(self):
+        self.guest_client.get(reverse('posts:main'))
+        self.guest_client.get(reverse('posts:main'))
+        lines = self.metrics()
+        self.assertIn(
+            'yatube_requests_total{method="GET",status="200",'
+            'view="posts:main"} 2',
+            lines
+        )
+        self.assertIn(
+            '# TYPE yatube_request_duration_seconds histogram', lines
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket{le="+Inf",'
+            'view="posts:main"} 2',
+            lines
+        )
+        self.assertIn(
+            'yatube_cache_requests_total{cache="feed",result="hit"} 1', lines
+        )
+        self.assertIn(
+            'yatube_cache_requests_total{cache="feed",result="miss"} 1', lines
+        )
+        for name in (
+            'yatube_sql_queries_total',
+            'yatube_sql_duration_seconds_total',
+            'yatube_template_render_seconds_total',
+        ):
+            with self.subTest(name=name):
+                self.assertTrue(any(
+                    line.startswith(f'{name}{{view="posts:main"}}')
+                    for line in lines
+                ))
+
+    def test_metrics_of_other_processes_are_summed(self):
+        self.guest_client.get(reverse('posts:main'))
+        registry.flush(force=True)
+        shutil.copy(registry.path(), f'{METRICS_DIR}/1.json')
+        self.assertIn(
+            'yatube_requests_total{method="GET",status="200",'
+            'view="posts:main"} 2',
+            self.metrics()
+        )
+
+    def test_dead_process_files_merged_into_totals(self):
+        self.guest_client.get(reverse('posts:main'))
+        registry.flush(force=True)
+        dead = f'{METRICS_DIR}/999999999.json'
+        shutil.move(registry.path(), dead)
+        registry.reset()
+        self.guest_client.get(reverse('posts:main'))
+        lines = self.metrics()
+        self.assertFalse(os.path.exists(dead))
+        self.assertTrue(os.path.exists(f'{METRICS_DIR}/{TOTALS_FILE}'))
+        self.assertIn(
+            'yatube_requests_total{method="GET",status="200",'
+            'view="posts:main"} 2',
+            lines
+        )
+
+    def test_metrics_closed_to_other_addresses(self):
+        client = Client(REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(client.get('/metrics').status_code, 403)
+        client.force_login(User.objects.create_user(
+            username='staff', is_staff=True
+        ))
+        self.assertEqual(client.get('/metrics').status_code, 200)
@@ -0,0 +1,128 @@
+import gzip
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core.microcache import MICROCACHE_HEADER, MicrocacheMiddleware
+
+from ..models import Post
+
+User = get_user_model()
+
+
+@override_settings(MICROCACHE_ENABLED=True)
+class MicrocacheTest(TestCase):
+    """Кеш страниц для анонимов"""
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(MicrocacheTest.user)
+
+    def test_anonymous_pages_cached(self):
+        urls = (
+            reverse('posts:main'),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('about:author'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                self.assertEqual(first[MICROCACHE_HEADER], 'MISS')
+                with self.assertNumQueries(0):
+                    second = self.guest_client.get(url)
+                self.assertEqual(second[MICROCACHE_HEADER], 'HIT')
+                self.assertEqual(second.content, first.content)
+
+    def test_cached_page_gzipped_for_capable_clients(self):
+        url = reverse('posts:main')
+        plain = self.guest_client.get(url)
+        response = self.guest_client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(
+            int(response['Content-Length']), len(response.content)
+        )
+
+    def test_gzipped_page_has_own_etag(self):
+        url = reverse('posts:main')
+        etag = self.guest_client.get(url)['ETag']
+        response = self.guest_client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        gzip_etag = response['ETag']
+        self.assertNotEqual(gzip_etag, etag)
+        response = self.guest_client.get(
+            url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=gzip_etag
+        )
+        self.assertEqual(response.status_code, 304)
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=gzip_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_hit_answers_conditional_get(self):
+        url = reverse('posts:main')
+        etag = self.guest_client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response[MICROCACHE_HEADER], 'HIT')
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+    def test_session_cookie_bypasses_cache(self):
+        url = reverse('posts:main')
+        self.guest_client.get(url)
+        response = self.authorized_client.get(url)
+        self.assertFalse(response.has_header(MICROCACHE_HEADER))
+        self.assertEqual(response.context['user'], MicrocacheTest.user)
+
+    def test_page_with_csrf_token_not_cached(self):
+        calls = []
+
+        def form_view(request):
+            calls.append(request)
+            return HttpResponse(get_token(request))
+
+        middleware = MicrocacheMiddleware(form_view)
+        for _ in range(2):
+            response = middleware(RequestFactory().get('/'))
+            self.assertFalse(response.has_header(MICROCACHE_HEADER))
+        self.assertEqual(len(calls), 2)
+
+    def test_concurrent_misses_render_once(self):
+        calls = []
+
+        def slow_view(request):
+            calls.append(request)
+            time.sleep(0.2)
+            return HttpResponse('Лента ' * 100)
+
+        middleware = MicrocacheMiddleware(slow_view)
+        responses = []
+
+        def get():
+            responses.append(middleware(RequestFactory().get('/')))
+
+        threads = [threading.Thread(target=get) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(
+            sorted(response[MICROCACHE_HEADER] for response in responses),
+            ['HIT'] * 4 + ['MISS'],
+        )
@@ -1,7 +1,18 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.test import TestCase
+from django.utils import timezone
 
-from ..models import Group, Post
+from ..bulk import bulk_create_posts
+from ..models import AuthorStats, Group, Post
+from ..rendering import EXCERPT_LENGTH
 
 User = get_user_model()
 
@@ -51,6 +62,77 @@ class PostModelTest(TestCase):
                     post._meta.get_field(field).help_text, expected_value)
 
 
+class PostRenderingTest(TestCase):
+    """HTML и анонс считаются при записи"""
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def test_save_renders_html_and_excerpt(self):
+        post = Post.objects.create(
+            author=PostRenderingTest.user, text='<b>Раз</b>\nдва'
+        )
+        self.assertEqual(post.text_html, '&lt;b&gt;Раз&lt;/b&gt;<br>два')
+        self.assertEqual(post.excerpt, post.text)
+        self.assertFalse(post.is_truncated)
+
+        post.text = 'слово ' * 100
+        post.save(update_fields=['text'])
+        post.refresh_from_db()
+        self.assertTrue(post.is_truncated)
+        self.assertLessEqual(len(post.excerpt), EXCERPT_LENGTH)
+        self.assertTrue(post.text.startswith(post.excerpt[:-1]))
+
+    def test_short_text_ending_with_ellipsis_not_truncated(self):
+        post = Post.objects.create(
+            author=PostRenderingTest.user, text='Продолжение следует…'
+        )
+        post = Post.objects.feed().get(pk=post.pk)
+        self.assertEqual(post.excerpt, 'Продолжение следует…')
+        self.assertFalse(post.is_truncated)
+
+    def test_bulk_insert_fits_query_params_limit(self):
+        inserts = []
+
+        def record(execute, sql, params, many, context):
+            if sql.startswith('INSERT INTO "posts_post"'):
+                inserts.append(len(params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            bulk_create_posts([
+                Post(author=PostRenderingTest.user, text=f'Пост {i}')
+                for i in range(300)
+            ])
+        self.assertGreater(len(inserts), 1)
+        self.assertLessEqual(
+            max(inserts), connection.features.max_query_params
+        )
+        self.assertEqual(Post.objects.count(), 300)
+
+    def test_bulk_load_and_backfill_render_text(self):
+        bulk_create_posts([
+            Post(
+                author=PostRenderingTest.user,
+                text=f'Пост\n{i}',
+                pub_date=timezone.now(),
+            )
+            for i in range(3)
+        ])
+        self.assertFalse(Post.objects.filter(text_html='').exists())
+
+        Post.objects.update(text_html='', excerpt='')
+        call_command('render_posts', stdout=StringIO())
+        for post in Post.objects.all():
+            with self.subTest(post=post.text):
+                self.assertEqual(post.text_html, post.text.replace(
+                    '\n', '<br>'
+                ))
+                self.assertEqual(post.excerpt, post.text)
+                self.assertFalse(post.is_truncated)
+
+
 class GroupModelTest(TestCase):
     @classmethod
     def setUpClass(cls) -> None:
@@ -65,3 +147,158 @@ class GroupModelTest(TestCase):
         group = GroupModelTest.group
         expected_title = group.title
         self.assertEqual(expected_title, str(group))
+
+
+class PostCountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug_test',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='slug_other',
+            description='Тестовое описание',
+        )
+
+    def assert_counters(self, author, group, other_group):
+        self.assertEqual(
+            AuthorStats.objects.get(user=PostCountersTest.user).posts_count,
+            author
+        )
+        for group, expected in (
+            (PostCountersTest.group, group),
+            (PostCountersTest.other_group, other_group),
+        ):
+            group.refresh_from_db()
+            self.assertEqual(group.posts_count, expected)
+
+    def test_counters_follow_create_move_delete(self):
+        post = Post.objects.create(
+            author=PostCountersTest.user,
+            text='Тестовый пост',
+            group=PostCountersTest.group,
+        )
+        Post.objects.create(author=PostCountersTest.user, text='Без группы')
+        self.assert_counters(2, 1, 0)
+
+        post.group = PostCountersTest.other_group
+        post.save()
+        self.assert_counters(2, 0, 1)
+
+        post.delete()
+        self.assert_counters(1, 0, 0)
+
+    def test_delete_after_drift_keeps_counters_at_zero(self):
+        post = Post.objects.create(
+            author=PostCountersTest.user,
+            text='Тестовый пост',
+            group=PostCountersTest.group,
+        )
+        Group.objects.update(posts_count=0)
+        AuthorStats.objects.update(posts_count=0)
+
+        post.delete()
+        self.assert_counters(0, 0, 0)
+
+    def test_recount_command_repairs_drift(self):
+        Post.objects.create(
+            author=PostCountersTest.user,
+            text='Тестовый пост',
+            group=PostCountersTest.group,
+        )
+        Group.objects.update(posts_count=42)
+        AuthorStats.objects.all().delete()
+
+        call_command('recount_posts', stdout=StringIO())
+        self.assert_counters(1, 1, 0)
+
+
+class ImportPostsTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='auth')
+        Post.objects.create(author=self.author, text='Старый пост')
+        rows = [
+            {
+                'text': f'Пост {i}',
+                'pub_date': f'2020-01-{i + 1:02d}T10:00:00+00:00',
+                'author': 'auth' if i % 2 else 'new_author',
+                'group': 'new_group' if i % 3 else '',
+            }
+            for i in range(7)
+        ]
+        fd, self.path = tempfile.mkstemp(suffix='.ndjson')
+        with os.fdopen(fd, 'w', encoding='utf-8') as data:
+            data.writelines(json.dumps(row) + '\n' for row in rows)
+        self.checkpoint = self.path + '.checkpoint'
+
+    def tearDown(self):
+        for path in (self.path, self.checkpoint):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def import_posts(self):
+        call_command(
+            'import_posts', self.path, chunk_size=3,
+            checkpoint=self.checkpoint, stdout=StringIO()
+        )
+
+    def test_import_creates_posts_users_and_groups(self):
+        self.import_posts()
+        self.assertEqual(Post.objects.count(), 8)
+        group = Group.objects.get(slug='new_group')
+        self.assertEqual(group.posts_count, 4)
+        new_author = User.objects.get(username='new_author')
+        self.assertEqual(new_author.stats.posts_count, 4)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.author).posts_count, 4
+        )
+        first = Post.objects.get(text='Пост 0')
+        self.assertEqual(
+            first.pub_date.isoformat(), '2020-01-01T10:00:00+00:00'
+        )
+
+    def test_import_reports_broken_json(self):
+        with open(self.path, 'a', encoding='utf-8') as data:
+            data.write('{"text": \n')
+        with self.assertRaisesMessage(CommandError, 'Строка 8'):
+            self.import_posts()
+        self.assertTrue(Post._meta.get_field('pub_date').auto_now_add)
+
+    def test_import_resumes_from_checkpoint(self):
+        with open(self.checkpoint, 'w') as checkpoint:
+            checkpoint.write('5')
+        self.import_posts()
+        self.assertEqual(Post.objects.count(), 3)
+        with open(self.checkpoint) as checkpoint:
+            self.assertEqual(checkpoint.read(), '7')
+
+
+class SeedCommandTest(TestCase):
+    def seed(self, **options):
+        call_command(
+            'seed', users=20, groups=5, posts=300, batch_size=100,
+            stdout=StringIO(), **options
+        )
+        return list(Post.objects.order_by('pk').values_list(
+            'text', 'pub_date', 'author__username', 'group__slug'
+        ))
+
+    def test_same_seed_gives_same_data(self):
+        first = self.seed(seed=7)
+        Post.objects.all().delete()
+        self.assertEqual(self.seed(seed=7), first)
+        Post.objects.all().delete()
+        self.assertNotEqual(self.seed(seed=8), first)
+
+    def test_activity_is_skewed_and_counters_are_filled(self):
+        self.seed()
+        stats = AuthorStats.objects.order_by('-posts_count')
+        self.assertGreater(stats[0].posts_count, 300 / 20 * 2)
+        self.assertEqual(sum(stat.posts_count for stat in stats), 300)
+        top_group = Group.objects.order_by('-posts_count').first()
+        self.assertEqual(top_group.slug, 'seed-group-0')
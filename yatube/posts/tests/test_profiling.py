@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.profiling import PROFILE_FILE_HEADER, list_profiles
+
+from ..models import Post
+
+User = get_user_model()
+
+PROFILING_DIR = tempfile.mkdtemp()
+
+
+@override_settings(PROFILING_DIR=PROFILING_DIR, PROFILING_MAX_FILES=2)
+class ProfilingTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.staff = User.objects.create_superuser(
+            username='staff', email='staff@example.com', password='pass'
+        )
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(PROFILING_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(PROFILING_DIR, ignore_errors=True)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ProfilingTest.user)
+        self.staff_client = Client()
+        self.staff_client.force_login(ProfilingTest.staff)
+
+    def test_only_staff_can_request_profile(self):
+        response = self.authorized_client.get(
+            reverse('posts:main'), {'_profile': 1}
+        )
+        self.assertNotIn(PROFILE_FILE_HEADER, response)
+        self.assertEqual(list_profiles(), [])
+        response = self.staff_client.get(
+            reverse('posts:main'), HTTP_X_PROFILE='1'
+        )
+        name = response[PROFILE_FILE_HEADER]
+        self.assertIn('posts:main', name)
+        self.assertEqual([path.name for path in list_profiles()], [name])
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_sampled_profiles_are_rotated(self):
+        for _ in range(3):
+            self.authorized_client.get(reverse('posts:main'))
+        self.assertEqual(len(os.listdir(PROFILING_DIR)), 2)
+
+    def test_admin_lists_and_serves_profiles(self):
+        name = self.staff_client.get(
+            reverse('posts:main'), {'_profile': 1}
+        )[PROFILE_FILE_HEADER]
+        response = self.staff_client.get(
+            reverse('admin:core_requestprofile_changelist')
+        )
+        self.assertContains(response, name)
+        response = self.staff_client.get(
+            reverse('admin:core_requestprofile_stats', args=[name])
+        )
+        self.assertContains(response, 'cumulative')
+        response = self.staff_client.get(
+            reverse('admin:core_requestprofile_download', args=[name])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content))
+        response = self.staff_client.get(
+            reverse('admin:core_requestprofile_download', args=['x.prof'])
+        )
+        self.assertEqual(response.status_code, 404)
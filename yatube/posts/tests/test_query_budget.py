@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.query_budget import (QueryRecorder, check_query_budget,
+                               expected_repeats, get_query_budget)
+
+from .. import urls
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class QueryBudgetTest(TestCase):
+    """Каждая страница posts укладывается в объявленный бюджет запросов"""
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='auth')
+        cls.other_user = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug_test',
+            description='Тестовое описание',
+        )
+        for i in range(1, 14):
+            author = cls.user if i % 2 else cls.other_user
+            cls.post = Post.objects.create(
+                author=author,
+                text='Тестовый пост' + str(i),
+                group=cls.group
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(QueryBudgetTest.post.author)
+
+    def assert_within_budget(self, response):
+        recorder = response.wsgi_request.query_recorder
+        view_name = response.wsgi_request.resolver_match.view_name
+        self.assertEqual(check_query_budget(view_name, recorder), [])
+
+    def test_every_url_declares_budget(self):
+        for pattern in urls.urlpatterns:
+            with self.subTest(name=pattern.name):
+                self.assertIsNotNone(
+                    get_query_budget(f'{urls.app_name}:{pattern.name}')
+                )
+
+    def test_pages_within_budget(self):
+        post = QueryBudgetTest.post
+        pages = (
+            reverse('posts:main'),
+            reverse(
+                'posts:group', kwargs={'slug': QueryBudgetTest.group.slug}
+            ),
+            reverse('posts:profile', kwargs={'username': post.author}),
+            reverse('posts:post_detail', kwargs={'post_id': post.id}),
+            reverse('posts:search') + '?q=пост',
+            reverse('posts:post_create'),
+            reverse('posts:post_edit', kwargs={'post_id': post.id}),
+        )
+        for url in pages:
+            with self.subTest(url=url):
+                self.assert_within_budget(self.author_client.get(url))
+
+    def test_writes_within_budget(self):
+        post = QueryBudgetTest.post
+        data = {'text': 'Тестовый пост', 'group': QueryBudgetTest.group.id}
+        for url in (
+            reverse('posts:post_create'),
+            reverse('posts:post_edit', kwargs={'post_id': post.id}),
+        ):
+            with self.subTest(url=url):
+                self.assert_within_budget(self.author_client.post(url, data))
+
+    def test_expected_repeats_not_reported(self):
+        with QueryRecorder() as recorder:
+            with expected_repeats():
+                for _ in range(5):
+                    Group.objects.filter(slug='slug_test').exists()
+        self.assertEqual(len(recorder), 5)
+        self.assertEqual(recorder.repeated_shapes(), {})
+        with QueryRecorder() as recorder:
+            for _ in range(5):
+                Group.objects.filter(slug='slug_test').exists()
+        self.assertEqual(len(recorder.repeated_shapes()), 1)
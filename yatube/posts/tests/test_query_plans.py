@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..utils import encode_cursor
+
+User = get_user_model()
+
+
+class FeedQueryPlanTest(TestCase):
+    """Запросы лент не должны сканировать таблицу или сортировать её"""
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug_test',
+            description='Тестовое описание',
+        )
+        for i in range(1, 14):
+            cls.post = Post.objects.create(
+                author=cls.user,
+                text='Тестовый пост' + str(i),
+                group=cls.group
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def feed_queries(self, url, data):
+        with CaptureQueriesContext(connection) as context:
+            self.guest_client.get(url, data)
+        return [
+            query['sql'] for query in context.captured_queries
+            if 'FROM "posts_post"' in query['sql']
+            and 'ORDER BY' in query['sql']
+        ]
+
+    def query_plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def test_feed_queries_use_indexes(self):
+        first_page = self.guest_client.get(
+            reverse('posts:main'), {'page': 1}
+        ).context['page_obj']
+        cursor = first_page.object_list[-1]
+        urls = (
+            reverse('posts:main'),
+            reverse(
+                'posts:group', kwargs={'slug': FeedQueryPlanTest.group.slug}
+            ),
+            reverse(
+                'posts:profile', kwargs={'username': FeedQueryPlanTest.user}
+            ),
+        )
+        pages = ({'page': 2}, {'after': encode_cursor(cursor)})
+        for url in urls:
+            for data in pages:
+                with self.subTest(url=url, data=data):
+                    queries = self.feed_queries(url, data)
+                    self.assertTrue(queries)
+                    for sql in queries:
+                        plan = self.query_plan(sql)
+                        for step in plan:
+                            self.assertNotIn('TEMP B-TREE', step, plan)
+                            if step.startswith('SCAN'):
+                                self.assertIn('INDEX', step, plan)
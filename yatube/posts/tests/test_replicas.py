@@ -0,0 +1,132 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.paginator import Paginator
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core.db_router import (PRIMARY_COOKIE, ReplicaRouter, _state,
+                            choose_replica)
+
+from ..cache import bump_feed_version, get_feed_page, index_feed
+from ..models import Post
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['default'])
+class ReplicaRouterTest(TestCase):
+    """Чтение с реплик только для разрешённых view и без записи"""
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ReplicaRouterTest.user)
+        patcher = mock.patch(
+            'core.db_router.choose_replica', return_value='default'
+        )
+        self.choose_replica = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_router_reads_from_replica_only_when_allowed(self):
+        router = ReplicaRouter()
+        self.choose_replica.return_value = 'replica1'
+        self.assertEqual(router.db_for_read(Post), 'default')
+        _state.use_replica = True
+        try:
+            self.assertEqual(router.db_for_read(Post), 'replica1')
+            self.assertEqual(router.db_for_write(Post), 'default')
+        finally:
+            _state.use_replica = False
+        self.assertFalse(router.allow_migrate('replica1', 'posts'))
+        self.assertTrue(router.allow_migrate('default', 'posts'))
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_sessions_and_users_read_from_primary(self):
+        router = ReplicaRouter()
+        self.choose_replica.return_value = 'replica1'
+        _state.use_replica = True
+        try:
+            self.assertEqual(router.db_for_read(User), 'default')
+            self.assertEqual(router.db_for_read(Session), 'default')
+        finally:
+            _state.use_replica = False
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_recently_written_feed_read_from_primary(self):
+        self.choose_replica.return_value = 'replica1'
+        databases = []
+
+        def paginate(request, posts, count):
+            databases.append(posts.db)
+            return Paginator(Post.objects.using('default').none(), 10).page(1)
+
+        _state.use_replica = True
+        try:
+            with mock.patch('posts.cache.paginate_page', paginate):
+                for _ in range(2):
+                    get_feed_page(
+                        RequestFactory().get('/'), index_feed(),
+                        Post.objects.all(), 0,
+                    )
+                    bump_feed_version(index_feed())
+        finally:
+            _state.use_replica = False
+        self.assertEqual(databases, ['replica1', 'default'])
+
+    def test_read_views_use_replica(self):
+        urls = (
+            reverse('posts:main'),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.choose_replica.reset_mock()
+                self.assertEqual(self.guest_client.get(url).status_code, 200)
+                self.assertTrue(self.choose_replica.called)
+
+    def test_replica_chosen_once_per_request(self):
+        self.choose_replica.side_effect = choose_replica
+        with mock.patch(
+            'core.db_router.random.choice', return_value='default'
+        ) as choice:
+            self.guest_client.get(reverse('posts:main'))
+            self.guest_client.get(
+                reverse('posts:profile', kwargs={'username': 'auth'})
+            )
+        self.assertGreater(self.choose_replica.call_count, 2)
+        self.assertEqual(choice.call_count, 2)
+
+    def test_other_views_use_primary(self):
+        self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertFalse(self.choose_replica.called)
+
+    def test_author_reads_primary_after_write(self):
+        response = self.authorized_client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'}
+        )
+        self.assertIn(PRIMARY_COOKIE, response.cookies)
+        self.choose_replica.reset_mock()
+        self.authorized_client.get(reverse('posts:main'))
+        self.assertFalse(self.choose_replica.called)
+
+    def test_reads_do_not_pin_primary(self):
+        response = self.guest_client.get(reverse('posts:main'))
+        self.assertNotIn(PRIMARY_COOKIE, response.cookies)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_sync_requires_replicas(self):
+        with self.assertRaises(CommandError):
+            call_command('sync_replicas')
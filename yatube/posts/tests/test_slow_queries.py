@@ -0,0 +1,94 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError
+from django.template import Context, Template
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.models import SlowQuery
+from core.slow_queries import SlowQueryRecorder, save_slow_queries
+
+from ..models import Post
+
+User = get_user_model()
+
+
+@override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+class SlowQueryLogTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.staff = User.objects.create_superuser(
+            username='staff', email='staff@example.com', password='pass'
+        )
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.staff_client = Client()
+        self.staff_client.force_login(SlowQueryLogTest.staff)
+
+    def test_queries_of_view_are_logged(self):
+        self.guest_client.get(
+            reverse('posts:profile', kwargs={'username': 'auth'})
+        )
+        entries = SlowQuery.objects.filter(view='posts:profile')
+        self.assertTrue(entries.exists())
+        entry = entries.filter(
+            sql__contains='WHERE "auth_user"."username" ='
+        ).first()
+        self.assertEqual(entry.params, 'str')
+        self.assertIn('posts/views.py', entry.stack)
+        self.assertNotIn('Тестовый', entry.sql)
+
+    def test_template_line_is_attributed(self):
+        template = Template(
+            '{% for post in posts %}\n{{ post.author.username }}'
+            '{% endfor %}'
+        )
+        with SlowQueryRecorder() as recorder:
+            template.render(Context({'posts': Post.objects.all()}))
+        templates = {query['template'] for query in recorder.queries}
+        self.assertEqual(
+            templates, {'<unknown source>:1', '<unknown source>:2'}
+        )
+
+    def test_log_write_failure_keeps_response(self):
+        locked = OperationalError('database is locked')
+        with mock.patch(
+            'core.slow_queries.save_slow_queries', side_effect=locked
+        ), self.assertLogs('core.slow_queries', 'ERROR'):
+            response = self.guest_client.get(reverse('posts:main'))
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(SLOW_QUERY_MAX_ENTRIES=3)
+    def test_log_is_bounded(self):
+        query = {
+            'duration': 1, 'sql': 'SELECT 1 LIMIT 5', 'params': '',
+            'template': '', 'stack': '',
+        }
+        save_slow_queries([query] * 5, 'test')
+        self.assertEqual(SlowQuery.objects.count(), 3)
+        self.assertEqual(
+            SlowQuery.objects.first().normalized, 'SELECT 1 LIMIT %d'
+        )
+
+    def test_admin_summary_groups_by_shape(self):
+        for page in (1, 2):
+            self.guest_client.get(reverse('posts:main'), {'page': page})
+        response = self.staff_client.get(
+            reverse('admin:core_slowquery_summary')
+        )
+        self.assertEqual(response.status_code, 200)
+        shapes = list(response.context['shapes'])
+        self.assertEqual(
+            len(shapes), len({shape['normalized'] for shape in shapes})
+        )
+        response = self.staff_client.get(
+            reverse('admin:core_slowquery_changelist')
+        )
+        self.assertContains(response, 'По формам запросов')
@@ -0,0 +1,47 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import TestCase
+
+
+class SQLiteTest(TestCase):
+    """PRAGMA из настроек и команда dbmaintain"""
+    def test_connection_pragmas_applied(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_pragmas_not_counted_as_queries(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        other = DatabaseWrapper({
+            **connection.settings_dict,
+            'NAME': os.path.join(directory.name, 'db.sqlite3'),
+        }, alias='pragmas')
+        self.addCleanup(other.close)
+        other.force_debug_cursor = True
+        other.ensure_connection()
+        self.assertEqual(len(other.queries_log), 0)
+        pragmas = other.connection.execute('PRAGMA journal_mode')
+        self.assertEqual(pragmas.fetchone()[0], 'wal')
+
+    def test_dbmaintain_reports_steps(self):
+        output = StringIO()
+        call_command('dbmaintain', 'analyze', 'vacuum', stdout=output)
+        lines = output.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith('Размер до'))
+        self.assertTrue(lines[1].startswith('analyze:'))
+        self.assertTrue(lines[2].startswith('vacuum:'))
+        self.assertIn('нужен --enable-incremental', lines[2])
+        self.assertTrue(lines[3].startswith('Размер после'))
+
+    def test_dbmaintain_rejects_unknown_step(self):
+        with self.assertRaises(CommandError):
+            call_command('dbmaintain', 'optimize', stdout=StringIO())
@@ -1,9 +1,21 @@
+import json
+from io import StringIO
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 
+from ..bulk import bulk_create_posts
+from ..cache import (author_feed, feed_count, get_feed_version, group_feed,
+                     index_feed)
 from ..forms import PostForm
-from ..models import Group, Post
+from ..models import AuthorStats, Follow, Group, Post, TimelineEntry
+from ..timeline import fan_out_post, follow_author, unfollow_author
+from ..utils import WindowedPaginator, encode_cursor
 
 User = get_user_model()
 
@@ -105,6 +117,22 @@ class PostViewsTest(TestCase):
         self.assertIn('author', response.context)
         self.assertEqual(response.context['author'], PostViewsTest.user)
 
+    def test_feed_shows_excerpt_with_read_more_link(self):
+        long_post = Post.objects.create(
+            author=PostViewsTest.user, text='Длинный текст. ' * 100
+        )
+        cache.clear()
+        self.addCleanup(cache.clear)
+        response = self.guest_client.get(reverse('posts:main'))
+        detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': long_post.pk}
+        )
+        self.assertContains(response, long_post.excerpt)
+        self.assertNotContains(response, long_post.text)
+        self.assertContains(response, f'<a href="{detail_url}">', count=1)
+        response = self.guest_client.get(detail_url)
+        self.assertContains(response, long_post.text.strip())
+
     def test_create_and_page_show_correct_context(self):
         list_urls = [
             reverse('posts:post_create'),
@@ -188,3 +216,510 @@ class PaginatorViewsTest(TestCase):
                     self.assertEqual(
                         len(response.context['page_obj']), count
                     )
+
+
+class WindowedPaginatorTest(TestCase):
+    """Окно номеров страниц и счётчик главной ленты"""
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        for i in range(1, 14):
+            Post.objects.create(author=cls.user, text='Тестовый пост' + str(i))
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_page_window_is_elided(self):
+        paginator = WindowedPaginator(range(1000), 10)
+        windows = (
+            (1, [1, 2, 3, None, 100]),
+            (5, [1, 2, 3, 4, 5, 6, 7, None, 100]),
+            (6, [1, None, 4, 5, 6, 7, 8, None, 100]),
+            (50, [1, None, 48, 49, 50, 51, 52, None, 100]),
+            (95, [1, None, 93, 94, 95, 96, 97, None, 100]),
+            (96, [1, None, 94, 95, 96, 97, 98, 99, 100]),
+            (99, [1, None, 97, 98, 99, 100]),
+        )
+        for number, window in windows:
+            with self.subTest(number=number):
+                self.assertEqual(paginator.page(number).page_window, window)
+        self.assertEqual(
+            WindowedPaginator(range(30), 10).page(2).page_window, [1, 2, 3]
+        )
+
+    def test_index_renders_window(self):
+        response = self.guest_client.get(reverse('posts:main'))
+        self.assertEqual(response.context['page_obj'].page_window, [1, 2])
+        self.assertContains(response, 'page=2">2</a>')
+
+    def test_index_count_is_cached(self):
+        posts = Post.objects.all()
+        self.assertEqual(feed_count(index_feed(), posts), 13)
+        with self.assertNumQueries(0):
+            self.assertEqual(feed_count(index_feed(), posts), 13)
+        Post.objects.create(author=WindowedPaginatorTest.user, text='Новый')
+        self.assertEqual(feed_count(index_feed(), posts), 14)
+
+    @override_settings(POSTS_COUNT_SYNC_LIMIT=0)
+    def test_large_feed_count_is_refreshed_in_background(self):
+        posts = Post.objects.all()
+        feed_count(index_feed(), posts)
+        Post.objects.create(author=WindowedPaginatorTest.user, text='Новый')
+        with mock.patch('posts.cache._count_executor') as executor:
+            with self.assertNumQueries(0):
+                self.assertEqual(feed_count(index_feed(), posts), 13)
+                self.assertEqual(feed_count(index_feed(), posts), 13)
+        executor.submit.assert_called_once()
+
+
+class CursorPaginatorViewsTest(TestCase):
+    """Тестирование keyset-пагинации"""
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug_test',
+            description='Тестовое описание',
+        )
+        for i in range(1, 14):
+            cls.post = Post.objects.create(
+                author=cls.user,
+                text='Тестовый пост' + str(i),
+                group=cls.group
+            )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_cursor_pages_cover_feed(self):
+        list_pag = [
+            reverse('posts:main'),
+            reverse(
+                'posts:group',
+                kwargs={'slug': CursorPaginatorViewsTest.group.slug}
+            ),
+            reverse(
+                'posts:profile',
+                kwargs={'username': CursorPaginatorViewsTest.user}
+            )
+        ]
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+        for url in list_pag:
+            with self.subTest(url=url):
+                with self.settings(POSTS_CURSOR_PAGINATION=True):
+                    first = self.guest_client.get(url).context['page_obj']
+                self.assertEqual(list(first), expected[:10])
+                self.assertTrue(first.has_next())
+                self.assertFalse(first.has_previous())
+
+                second = self.guest_client.get(
+                    url, {'after': first.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(second), expected[10:])
+                self.assertFalse(second.has_next())
+                self.assertTrue(second.has_previous())
+
+                back = self.guest_client.get(
+                    url, {'before': second.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(back), expected[:10])
+
+    def test_page_past_end_has_no_cursor_links(self):
+        last = Post.objects.order_by('pub_date', 'id').first()
+        response = self.guest_client.get(
+            reverse('posts:main'), {'after': encode_cursor(last)}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), 0)
+        self.assertIsNone(page_obj.previous_cursor)
+        self.assertContains(response, 'Первая')
+        self.assertNotContains(response, 'before=')
+        self.assertNotContains(response, 'None')
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        response = self.guest_client.get(
+            reverse('posts:main'), {'after': 'broken'}
+        )
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+
+class FeedCacheTest(TestCase):
+    """Тестирование кеша лент"""
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug_test',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='slug_other',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_cached_feed_page_skips_feed_queries(self):
+        url = reverse('posts:main')
+        self.guest_client.get(url)
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url)
+        self.assertEqual(
+            list(response.context['page_obj']), [FeedCacheTest.post]
+        )
+
+    def test_new_post_invalidates_only_related_feeds(self):
+        feeds = (
+            index_feed(),
+            group_feed(FeedCacheTest.group.slug),
+            group_feed(FeedCacheTest.other_group.slug),
+            author_feed(FeedCacheTest.user.username),
+        )
+        before = {feed: get_feed_version(feed) for feed in feeds}
+        Post.objects.create(
+            author=FeedCacheTest.user,
+            text='Новый пост',
+            group=FeedCacheTest.group,
+        )
+        changed = {
+            feed for feed in feeds if get_feed_version(feed) != before[feed]
+        }
+        self.assertEqual(changed, set(feeds) - {feeds[2]})
+
+    def test_moved_post_invalidates_old_group(self):
+        url = reverse(
+            'posts:group', kwargs={'slug': FeedCacheTest.group.slug}
+        )
+        self.guest_client.get(url)
+        post = Post.objects.get(pk=FeedCacheTest.post.pk)
+        post.group = FeedCacheTest.other_group
+        post.save()
+        response = self.guest_client.get(url)
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_group_slug_change_refreshes_cached_pages(self):
+        url = reverse('posts:main')
+        self.guest_client.get(url)
+        group = Group.objects.get(pk=FeedCacheTest.group.pk)
+        group.slug = 'slug_renamed'
+        group.save()
+        response = self.guest_client.get(url)
+        self.assertContains(
+            response, reverse('posts:group', args=('slug_renamed',))
+        )
+
+
+class SearchViewTest(TestCase):
+    """Тестирование полнотекстового поиска"""
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Лев Толстой написал роман',
+        )
+        for i in range(1, 13):
+            Post.objects.create(
+                author=cls.user,
+                text=f'Пушкин пост {i}',
+            )
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.admin_client = Client()
+        self.admin_client.force_login(
+            User.objects.create_superuser('admin', 'admin@ya.ru', 'pass')
+        )
+
+    def search(self, query, **params):
+        return self.guest_client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+
+    def test_search_finds_words_by_prefix(self):
+        response = self.search('толст')
+        self.assertEqual(
+            list(response.context['page_obj']), [SearchViewTest.post]
+        )
+
+    def test_search_is_paginated(self):
+        response = self.search('пушкин')
+        self.assertEqual(response.context['page_obj'].paginator.count, 12)
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertContains(
+            response, '?q=%D0%BF%D1%83%D1%88%D0%BA%D0%B8%D0%BD&amp;page=2'
+        )
+        second_page = self.search('пушкин', page=2).context['page_obj']
+        self.assertEqual(len(second_page), 2)
+
+    def test_index_follows_edit_and_delete(self):
+        post = Post.objects.get(pk=SearchViewTest.post.pk)
+        post.text = 'Чехов'
+        post.save()
+        self.assertEqual(len(self.search('толстой').context['page_obj']), 0)
+        self.assertEqual(len(self.search('чехов').context['page_obj']), 1)
+        post.delete()
+        self.assertEqual(len(self.search('чехов').context['page_obj']), 0)
+
+    def test_search_syntax_is_escaped(self):
+        response = self.search('"AND OR (')
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_search_uses_index(self):
+        response = self.admin_client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'толст'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [SearchViewTest.post]
+        )
+        response = self.admin_client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'пушкин'}
+        )
+        self.assertEqual(len(response.context['cl'].result_list), 12)
+
+
+@override_settings(POSTS_FANOUT_MAX_FOLLOWERS=2)
+class FollowViewsTest(TestCase):
+    """Тестирование подписок и ленты подписок"""
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+
+        cls.author = User.objects.create_user(username='author')
+        cls.celebrity = User.objects.create_user(username='celebrity')
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Старый пост',
+        )
+
+    def setUp(self):
+        self.follower = User.objects.create_user(username='follower')
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def follow_feed(self):
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def follow(self, author, url='posts:profile_follow'):
+        self.follower_client.get(
+            reverse(url, kwargs={'username': author.username})
+        )
+
+    def test_follow_backfills_and_fans_out(self):
+        self.follow(FollowViewsTest.author)
+        self.assertTrue(Follow.objects.filter(
+            user=self.follower, author=FollowViewsTest.author
+        ).exists())
+        self.assertEqual(self.follow_feed(), [FollowViewsTest.post])
+
+        author_client = Client()
+        author_client.force_login(FollowViewsTest.author)
+        author_client.post(reverse('posts:post_create'), {'text': 'Новый'})
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.follower).count(), 2
+        )
+        self.assertEqual(self.follow_feed()[0].text, 'Новый')
+
+    def test_unfollow_clears_timeline(self):
+        self.follow(FollowViewsTest.author)
+        self.follow(FollowViewsTest.author, 'posts:profile_unfollow')
+        self.assertFalse(Follow.objects.filter(user=self.follower).exists())
+        self.assertEqual(self.follow_feed(), [])
+
+    def test_cannot_follow_self(self):
+        self.follow(self.follower)
+        self.assertFalse(Follow.objects.filter(user=self.follower).exists())
+
+    def test_celebrity_posts_are_read_on_demand(self):
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=other, author=FollowViewsTest.celebrity)
+        AuthorStats.objects.create(
+            user=FollowViewsTest.celebrity, followers_count=1
+        )
+        self.follow(FollowViewsTest.celebrity)
+        self.follow(FollowViewsTest.author)
+        post = Post.objects.create(
+            author=FollowViewsTest.celebrity, text='Пост звезды'
+        )
+        fan_out_post(post)
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.assertEqual(self.follow_feed(), [post, FollowViewsTest.post])
+
+    def test_demoted_celebrity_posts_stay_in_timeline(self):
+        other = User.objects.create_user(username='other')
+        follow_author(other, FollowViewsTest.celebrity)
+        self.follow(FollowViewsTest.celebrity)
+        post = Post.objects.create(
+            author=FollowViewsTest.celebrity, text='Пост звезды'
+        )
+        fan_out_post(post)
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        unfollow_author(other, FollowViewsTest.celebrity)
+        self.assertEqual(self.follow_feed(), [post])
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=post
+        ).exists())
+
+    def test_bulk_created_posts_fanned_out(self):
+        self.follow(FollowViewsTest.author)
+        bulk_create_posts([Post(
+            author=FollowViewsTest.author, text='Загруженный пост',
+            pub_date=timezone.now(),
+        )])
+        self.assertEqual(self.follow_feed()[0].text, 'Загруженный пост')
+
+
+class ConditionalGetTest(TestCase):
+    """Тестирование ответов 304 по ETag"""
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug_test',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.urls = (
+            reverse('posts:main'),
+            reverse(
+                'posts:group', kwargs={'slug': ConditionalGetTest.group.slug}
+            ),
+            reverse(
+                'posts:profile', kwargs={'username': ConditionalGetTest.user}
+            ),
+            reverse(
+                'posts:post_detail',
+                kwargs={'post_id': ConditionalGetTest.post.id}
+            ),
+        )
+
+    def revalidate(self, url, etag):
+        return self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_pages_answer_not_modified(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)['ETag']
+                self.assertEqual(self.revalidate(url, etag).status_code, 304)
+
+    def test_post_edit_changes_etags(self):
+        etags = {url: self.guest_client.get(url)['ETag'] for url in self.urls}
+        post = Post.objects.get(pk=ConditionalGetTest.post.pk)
+        post.text = 'Новый текст'
+        post.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+    def test_etag_depends_on_session(self):
+        url = reverse('posts:main')
+        etag = self.guest_client.get(url)['ETag']
+        author_client = Client()
+        author_client.force_login(ConditionalGetTest.user)
+        response = author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_follow_changes_profile_etag(self):
+        url = reverse(
+            'posts:profile', kwargs={'username': ConditionalGetTest.user}
+        )
+        reader_client = Client()
+        reader_client.force_login(User.objects.create_user(username='reader'))
+        for action in ('posts:profile_follow', 'posts:profile_unfollow'):
+            with self.subTest(action=action):
+                etag = reader_client.get(url)['ETag']
+                reader_client.get(reverse(
+                    action, kwargs={'username': ConditionalGetTest.user}
+                ))
+                response = reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+
+class ExportPostsTest(TestCase):
+    """Тестирование потоковой выгрузки постов"""
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug_test',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Пост в группе',
+            group=cls.group,
+        )
+        Post.objects.create(author=cls.user, text='Пост без группы')
+
+    def setUp(self):
+        self.staff_client = Client()
+        self.staff_client.force_login(
+            User.objects.create_user(username='staff', is_staff=True)
+        )
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ExportPostsTest.user)
+
+    def export(self, **params):
+        response = self.staff_client.get(reverse('posts:export_posts'), params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_is_staff_only(self):
+        response = self.authorized_client.get(reverse('posts:export_posts'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_export_ndjson_filtered_by_group(self):
+        lines = self.export(group=ExportPostsTest.group.slug).splitlines()
+        self.assertEqual(len(lines), 1)
+        row = json.loads(lines[0])
+        self.assertEqual(row['id'], ExportPostsTest.post.id)
+        self.assertEqual(row['author'], 'auth')
+        self.assertEqual(row['group'], 'slug_test')
+
+    def test_export_csv(self):
+        lines = self.export(format='csv').splitlines()
+        self.assertEqual(lines[0], 'id,text,pub_date,author,group')
+        self.assertEqual(len(lines), 3)
+
+    def test_export_rejects_bad_date(self):
+        response = self.staff_client.get(
+            reverse('posts:export_posts'), {'since': 'вчера'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_command(self):
+        out = StringIO()
+        call_command('export_posts', author='auth', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
@@ -0,0 +1,88 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+# Все размеры, которые шаблоны запрашивают через {% post_thumbnail %}
+THUMBNAIL_SIZES = (
+    ('800x600', {'crop': 'center', 'upscale': True}),
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+
+_executor = None
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def get_executor(workers=None):
+    """Пул процессов для миниатюр.
+
+    Процессы запускаются через spawn: соединения с SQLite нельзя
+    наследовать через fork.
+    """
+    global _executor
+    if workers is None and _executor is not None:
+        return _executor
+    executor = ProcessPoolExecutor(
+        workers or settings.POSTS_THUMBNAIL_WORKERS,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+    )
+    if workers is None:
+        _executor = executor
+    return executor
+
+
+def generate_thumbnails(name):
+    """Создаёт все миниатюры картинки, возвращает их имена в хранилище."""
+    return [
+        get_thumbnail(name, geometry, **options).name
+        for geometry, options in THUMBNAIL_SIZES
+    ]
+
+
+def schedule_thumbnails(name):
+    """Отправляет генерацию миниатюр в пул процессов."""
+    if not settings.POSTS_THUMBNAIL_WORKERS:
+        generate_thumbnails(name)
+        return
+    get_executor().submit(generate_thumbnails, name)
+
+
+def _thumbnail_options(source, options):
+    """Опции, которые get_thumbnail дополняет умолчаниями перед тем, как
+    вычислить имя файла миниатюры."""
+    backend = default.backend
+    options = dict(options)
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def cached_thumbnail(image, geometry):
+    """Готовая миниатюра картинки или None.
+
+    В отличие от {% thumbnail %} ничего не создаёт и не обращается к
+    kvstore sorl: имя файла вычисляется так же, как в get_thumbnail, и
+    проверяется его наличие в хранилище.
+    """
+    if not image:
+        return None
+    source = ImageFile(image)
+    options = _thumbnail_options(source, dict(THUMBNAIL_SIZES)[geometry])
+    name = default.backend._get_thumbnail_filename(source, geometry, options)
+    thumbnail = ImageFile(name, default.storage)
+    return thumbnail if thumbnail.exists() else None
@@ -0,0 +1,140 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .cache import follows_feed, invalidate_feeds
+from .counters import shifted
+from .models import (AuthorStats, DeletionJob, Follow, Post, TimelineEntry,
+                     hidden_group)
+from .utils import POSTS_PER_PAGE, WindowedPaginator
+
+FAN_OUT_BATCH_SIZE = 500
+
+
+def is_celebrity(author_id):
+    """Авторы с большим числом подписчиков читаются при чтении ленты."""
+    return AuthorStats.objects.filter(
+        user_id=author_id,
+        followers_count__gte=settings.POSTS_FANOUT_MAX_FOLLOWERS,
+    ).exists()
+
+
+def _add_entries(user_ids, posts):
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in user_ids for post in posts
+        ),
+        batch_size=FAN_OUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_posts(author_id, posts):
+    """Раскладывает посты автора по лентам его подписчиков."""
+    if is_celebrity(author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    _add_entries(followers, posts)
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    fan_out_posts(post.author_id, [post])
+
+
+def fan_out_since(last_pk):
+    """Раскладывает посты с pk больше last_pk, созданные bulk_create без
+    сигналов; авторы без подписчиков не стоят ни одного запроса."""
+    posts = Post.objects.filter(pk__gt=last_pk).order_by()
+    authors = Follow.objects.filter(
+        author_id__in=posts.values('author_id')
+    ).order_by().values_list('author_id', flat=True).distinct()
+    for author_id in authors:
+        fan_out_posts(author_id, posts.filter(author_id=author_id).only(
+            'pk', 'pub_date'
+        ))
+
+
+def restore_fan_out(author_ids):
+    """Авторы, у которых подписчиков стало меньше порога, раскладываются
+    при записи. Их посты времён «звезды» в ленты не попадали и без
+    подмешивания при чтении пропали бы: последние из них раскладываются
+    сейчас, как при подписке."""
+    demoted = AuthorStats.objects.filter(
+        user_id__in=author_ids,
+        followers_count=settings.POSTS_FANOUT_MAX_FOLLOWERS - 1,
+    ).values_list('user_id', flat=True)
+    for author_id in demoted:
+        fan_out_posts(author_id, Post.objects.filter(
+            author_id=author_id
+        ).only('pk', 'pub_date')[:settings.POSTS_TIMELINE_BACKFILL])
+
+
+def _change_followers_count(author_id, delta):
+    AuthorStats.objects.get_or_create(user_id=author_id)
+    AuthorStats.objects.filter(user_id=author_id).update(
+        followers_count=shifted('followers_count', delta)
+    )
+    if delta < 0:
+        restore_fan_out([author_id])
+
+
+@transaction.atomic
+def follow_author(user, author):
+    _, created = Follow.objects.get_or_create(user=user, author=author)
+    if not created:
+        return
+    invalidate_feeds([follows_feed(user.pk)])
+    _change_followers_count(author.pk, 1)
+    if not is_celebrity(author.pk):
+        recent = Post.objects.filter(author=author)[
+            :settings.POSTS_TIMELINE_BACKFILL
+        ]
+        _add_entries([user.pk], recent)
+
+
+@transaction.atomic
+def unfollow_author(user, author):
+    deleted, _ = Follow.objects.filter(user=user, author=author).delete()
+    if not deleted:
+        return
+    invalidate_feeds([follows_feed(user.pk)])
+    _change_followers_count(author.pk, -1)
+    TimelineEntry.objects.filter(user=user, post__author=author).delete()
+
+
+def get_follow_page(request, user):
+    """Страница ленты подписок.
+
+    Обычно это диапазон по индексу (user, pub_date) в TimelineEntry.
+    Посты авторов-«звёзд» в таблицу не раскладываются и добавляются
+    к выборке при чтении.
+    """
+    celebrities = list(Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gte=(
+            settings.POSTS_FANOUT_MAX_FOLLOWERS
+        ),
+    ).values_list('author_id', flat=True))
+    page_number = request.GET.get('page')
+    if celebrities:
+        posts = Post.objects.feed().filter(
+            Q(pk__in=TimelineEntry.objects.filter(
+                user=user
+            ).values('post_id'))
+            | Q(author_id__in=celebrities)
+        )
+        return WindowedPaginator(posts, POSTS_PER_PAGE).get_page(page_number)
+    entries = TimelineEntry.objects.filter(user=user).exclude(
+        post__author_id__in=DeletionJob.objects.pending_ids(DeletionJob.USER)
+    ).select_related('post__author', 'post__group').annotate(
+        group_hidden=hidden_group('post__group_id')
+    )
+    page_obj = WindowedPaginator(entries, POSTS_PER_PAGE).get_page(page_number)
+    for entry in page_obj:
+        entry.post.group_hidden = entry.group_hidden
+    page_obj.object_list = [entry.post for entry in page_obj]
+    return page_obj
@@ -4,11 +4,44 @@ from . import views
 
 app_name = 'posts'
 
+# Максимум SQL-запросов на один запрос к view (с учётом сессии и
+# пользователя), проверяется core.query_budget.QueryBudgetMiddleware.
+query_budgets = {
+    'main': 4,
+    # Группа и, на холодном кеше, COUNT видимых постов, как у главной
+    'group': 5,
+    'profile': 5,
+    'profile_follow': 10,
+    # Проверка, не опустился ли автор ниже порога «звёзд»
+    'profile_unfollow': 8,
+    'follow_index': 5,
+    'post_detail': 4,
+    'search': 5,
+    'export_posts': 2,
+    # Первый пост автора заводит строку AuthorStats: COUNT и INSERT
+    'post_create': 12,
+    # Смена группы: счётчики обеих групп и их slug для сброса кеша
+    'post_edit': 9,
+}
+
 urlpatterns = [
     path('', views.index, name='main'),
     path('group/<slug:slug>/', views.group_posts, name='group'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path(
+        'profile/<str:username>/follow/',
+        views.profile_follow,
+        name='profile_follow'
+    ),
+    path(
+        'profile/<str:username>/unfollow/',
+        views.profile_unfollow,
+        name='profile_unfollow'
+    ),
+    path('follow/', views.follow_index, name='follow_index'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('search/', views.search, name='search'),
+    path('export/', views.export_posts, name='export_posts'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit')
 ]
@@ -1,7 +1,150 @@
-from django.core.paginator import Paginator
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 
+POSTS_PER_PAGE = 10
+PAGE_WINDOW_ON_EACH_SIDE = 2
+PAGE_WINDOW_ON_ENDS = 1
+FEED_ORDERING = ('-pub_date', '-pk')
+CURSOR_SEPARATOR = '|'
 
-def paginate_page(request, post_list):
-    paginator = Paginator(post_list, 10)
+
+def encode_cursor(post):
+    """Непрозрачный курсор из пары (pub_date, id) поста."""
+    value = f'{post.pub_date.isoformat()}{CURSOR_SEPARATOR}{post.pk}'
+    return urlsafe_base64_encode(force_bytes(value))
+
+
+def decode_cursor(token):
+    """Обратное преобразование курсора, None для битого значения."""
+    try:
+        value = urlsafe_base64_decode(token).decode()
+        pub_date, pk = value.split(CURSOR_SEPARATOR)
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+class WindowedPage(Page):
+    @property
+    def page_window(self):
+        return self.paginator.get_elided_page_range(self.number)
+
+
+class WindowedPaginator(Paginator):
+    """Пагинатор, отдающий окно номеров страниц вместо page_range.
+
+    В окне первые и последние страницы и соседи текущей, пропуски
+    обозначены None: ссылок не больше десятка при любом числе страниц.
+    """
+
+    def _get_page(self, *args, **kwargs):
+        return WindowedPage(*args, **kwargs)
+
+    def get_elided_page_range(self, number, on_each_side=None, on_ends=None):
+        if on_each_side is None:
+            on_each_side = PAGE_WINDOW_ON_EACH_SIDE
+        if on_ends is None:
+            on_ends = PAGE_WINDOW_ON_ENDS
+        num_pages = self.num_pages
+        if num_pages <= (on_each_side + on_ends) * 2:
+            return list(range(1, num_pages + 1))
+        # Пропуск ставится, только если скрывает больше одной страницы,
+        # как в Paginator.get_elided_page_range() новых Django.
+        pages = []
+        if number > 1 + on_each_side + on_ends + 1:
+            pages.extend(range(1, on_ends + 1))
+            pages.append(None)
+            pages.extend(range(number - on_each_side, number + 1))
+        else:
+            pages.extend(range(1, number + 1))
+        if number < num_pages - on_each_side - on_ends - 1:
+            pages.extend(range(number + 1, number + on_each_side + 1))
+            pages.append(None)
+            pages.extend(range(num_pages - on_ends + 1, num_pages + 1))
+        else:
+            pages.extend(range(number + 1, num_pages + 1))
+        return pages
+
+
+class CursorPage(Page):
+    """Страница keyset-пагинации: без номера и без COUNT(*)."""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        # Подписи как у ссылок: предыдущая страница — before=previous_cursor,
+        # следующая — after=next_cursor.
+        return f'<Page before {self.previous_cursor} after {self.next_cursor}>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self.object_list:
+            return None
+        return encode_cursor(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self.object_list:
+            return None
+        return encode_cursor(self.object_list[0])
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (pub_date, id).
+
+    Страница выбирается условием по ключу вместо OFFSET, поэтому любая
+    страница стоит столько же, сколько первая.
+    """
+    cursor_mode = True
+
+    def cursor_page(self, after=None, before=None):
+        posts = self.object_list.order_by(*FEED_ORDERING)
+        if before is not None:
+            pub_date, pk = before
+            posts = posts.filter(
+                Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk)
+            ).reverse()
+        elif after is not None:
+            pub_date, pk = after
+            posts = posts.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+            )
+        object_list = list(posts[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if before is not None:
+            object_list.reverse()
+            return CursorPage(object_list, self, True, has_more)
+        return CursorPage(object_list, self, has_more, after is not None)
+
+
+def paginate_page(request, post_list, count=None):
+    after = decode_cursor(request.GET.get('after', ''))
+    before = decode_cursor(request.GET.get('before', ''))
+    cursor_mode = getattr(settings, 'POSTS_CURSOR_PAGINATION', False)
+    if cursor_mode or after is not None or before is not None:
+        paginator = CursorPaginator(post_list, POSTS_PER_PAGE)
+        return paginator.cursor_page(after=after, before=before)
+    paginator = WindowedPaginator(post_list, POSTS_PER_PAGE)
+    if count is not None:
+        # Известный счётчик избавляет пагинатор от COUNT(*).
+        paginator.count = count
     page_number = request.GET.get("page")
     return paginator.get_page(page_number)
@@ -1,26 +1,55 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.http import (Http404, HttpResponseBadRequest,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.http import urlencode
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
 
-from .forms import PostForm
-from .models import Group, Post, User
-from .utils import paginate_page
+from .cache import (author_feed, feed_count, get_feed_page, group_feed,
+                    group_etag, index_etag, index_feed, post_etag,
+                    profile_etag)
+from .counters import author_posts_count
+from .export import EXPORT_FORMATS, export_queryset, parse_day
+from .forms import PostForm, PostImageForm
+from .models import DeletionJob, Group, Post, User, hidden_group
+from .search import SearchResults
+from .timeline import (fan_out_post, follow_author, get_follow_page,
+                       unfollow_author)
+from .utils import POSTS_PER_PAGE, WindowedPaginator
 
 
+@vary_on_cookie
+@condition(etag_func=index_etag)
 def index(request):
     template_main = 'posts/index.html'
-    posts = Post.objects.select_related('author', 'group')
-    page_obj = paginate_page(request, posts)
+    page_obj = get_feed_page(
+        request, index_feed(), Post.objects.feed(),
+        feed_count(index_feed(), Post.objects.visible()),
+    )
     context = {
         'page_obj': page_obj,
     }
     return render(request, template_main, context)
 
 
+@vary_on_cookie
+@condition(etag_func=group_etag)
 def group_posts(request, slug):
     template_group = 'posts/group_list.html'
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    page_obj = paginate_page(request, posts)
+    group = get_object_or_404(
+        Group.objects.exclude(
+            pk__in=DeletionJob.objects.pending_ids(DeletionJob.GROUP)
+        ),
+        slug=slug,
+    )
+    # Не group.posts_count: в нём и посты удаляемых авторов, скрытые
+    # из ленты, и последние страницы оказались бы пустыми.
+    page_obj = get_feed_page(
+        request, group_feed(group.slug), group.posts.feed(),
+        feed_count(group_feed(group.slug), group.posts.visible()),
+    )
     context = {
         'page_obj': page_obj,
         'group': group
@@ -28,25 +57,64 @@ def group_posts(request, slug):
     return render(request, template_group, context)
 
 
+@vary_on_cookie
+@condition(etag_func=profile_etag)
 def profile(request, username):
     template_name = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    profile = author.posts.all()
-    page_obj = paginate_page(request, profile)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    # Удаляемого пользователя скрывают сразу; задачи есть только у
+    # неактивных, активным лишний запрос не нужен.
+    if not author.is_active and DeletionJob.objects.pending_ids(
+        DeletionJob.USER
+    ).filter(object_id=author.pk).exists():
+        raise Http404
+    profile = author.posts.feed()
+    page_obj = get_feed_page(
+        request,
+        author_feed(author.username),
+        profile,
+        author_posts_count(author)
+    )
+    following = (
+        request.user.is_authenticated
+        and author.following.filter(user=request.user).exists()
+    )
     context = {
         'page_obj': page_obj,
-        'author': author
+        'author': author,
+        'following': following
     }
     return render(request, template_name, context)
 
 
+def search(request):
+    template_name = 'posts/search.html'
+    query = request.GET.get('q', '')
+    paginator = WindowedPaginator(SearchResults(query), POSTS_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'page_obj': page_obj,
+        'query': query,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, template_name, context)
+
+
+@vary_on_cookie
+@condition(etag_func=post_etag)
 def post_detail(request, post_id):
     template_name = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
-    author = get_object_or_404(User, id=post.author_id)
+    post = get_object_or_404(
+        Post.objects.visible().annotate(
+            group_hidden=hidden_group()
+        ).select_related('author__stats', 'group'),
+        pk=post_id,
+    )
     context = {
         'post': post,
-        'author': author
+        'author': post.author
     }
     return render(request, template_name, context)
 
@@ -58,13 +126,21 @@ def post_create(request):
         request.POST,
         files=request.FILES or None
     )
-    if form.is_valid():
+    # Картинка — отдельная форма над тем же объектом поста.
+    image_form = PostImageForm(
+        request.POST or None,
+        files=request.FILES or None,
+        instance=form.instance
+    )
+    if form.is_valid() and image_form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        fan_out_post(post)
         return redirect('posts:profile', username=post.author)
     context = {
         'form': form,
+        'image_form': image_form,
         'is_edit': False
     }
     return render(request, template_name, context)
@@ -73,7 +149,7 @@ def post_create(request):
 @login_required
 def post_edit(request, post_id):
     template_name = 'posts/create_post.html'
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post.objects.select_related('author'), id=post_id)
 
     if request.user != post.author:
         return redirect('posts:profile', post.author)
@@ -83,14 +159,67 @@ def post_edit(request, post_id):
         files=request.FILES or None,
         instance=post
     )
-    if form.is_valid():
-        post = form.save()
-        post.author = request.user
-        post.save()
+    image_form = PostImageForm(
+        request.POST or None,
+        files=request.FILES or None,
+        instance=post
+    )
+    if form.is_valid() and image_form.is_valid():
+        form.save()
         return redirect('posts:post_detail', post_id)
     context = {
         'form': form,
+        'image_form': image_form,
         'is_edit': True,
         'post': post
     }
     return render(request, template_name, context)
+
+
+@login_required
+def follow_index(request):
+    template_name = 'posts/follow.html'
+    page_obj = get_follow_page(request, request.user)
+    context = {
+        'page_obj': page_obj,
+    }
+    return render(request, template_name, context)
+
+
+@login_required
+def profile_follow(request, username):
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        follow_author(request.user, author)
+    return redirect('posts:profile', username=username)
+
+
+@login_required
+def profile_unfollow(request, username):
+    author = get_object_or_404(User, username=username)
+    unfollow_author(request.user, author)
+    return redirect('posts:profile', username=username)
+
+
+@staff_member_required
+def export_posts(request):
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest('Неизвестный формат выгрузки')
+    try:
+        posts = export_queryset(
+            group=request.GET.get('group'),
+            author=request.GET.get('author'),
+            since=parse_day(request.GET.get('since')),
+            until=parse_day(request.GET.get('until')),
+        )
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    write_rows, content_type = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(
+        write_rows(posts), content_type=content_type
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="posts.{export_format}"'
+    )
+    return response
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -50,11 +51,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.slow_queries.SlowQueryMiddleware',
+    'core.metrics.MetricsMiddleware',
+    'core.query_budget.QueryBudgetMiddleware',
+    'core.db_router.ReplicaMiddleware',
+    'core.microcache.MicrocacheMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -64,7 +71,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.metrics.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -89,9 +96,90 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение живёт дольше запроса: PRAGMA не повторяются каждый раз
+        'CONN_MAX_AGE': 60,
     }
 }
 
+# PRAGMA для каждого соединения с SQLite (core.sqlite). WAL позволяет
+# читать во время записи, busy_timeout ждёт блокировку вместо ошибки
+# «database is locked», synchronous=NORMAL в режиме WAL не теряет
+# целостность, а fsync делает только при checkpoint.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+# Реплики только для чтения. YATUBE_DB_REPLICAS=N добавляет SQLite-копии
+# db.replicaN.sqlite3 основной базы, их обновляет команда sync_replicas.
+DATABASE_REPLICAS = []
+for number in range(1, int(os.environ.get('YATUBE_DB_REPLICAS', 0)) + 1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db.{alias}.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+# View, которые читают с реплик, и сколько секунд после записи
+# пользователь читает из основной базы
+REPLICA_READ_VIEWS = [
+    'posts:main',
+    'posts:group',
+    'posts:profile',
+    'posts:post_detail',
+    'about:author',
+    'about:tech',
+]
+REPLICA_STICKY_SECONDS = 15
+
+# Кеш общий для всех процессов сервера: версии лент, счётчики и микрокеш
+# должны сбрасываться сразу у всех воркеров, а LocMemCache живёт в одном
+# процессе. Файловый кеш не требует сервисов; в продакшене его можно
+# заменить на memcached или redis. Тесты идут в одном процессе и не
+# должны видеть записи прошлых запусков, им хватает LocMemCache.
+CACHE_DIR = os.environ.get(
+    'YATUBE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'yatube-cache')
+)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+# Время жизни закешированных страниц лент; актуальность обеспечивают
+# версии лент, которые сбрасываются сигналами Post.
+POSTS_FEED_CACHE_TIMEOUT = 60 * 5
+
+# Микрокеш целых страниц для анонимов (core.microcache): время жизни
+# страницы, сколько ждать чужую отрисовку того же адреса, где лежат
+# файлы блокировок отрисовки и какие view кешируются. В разработке
+# выключен, чтобы изменения были видны сразу.
+MICROCACHE_ENABLED = not DEBUG
+MICROCACHE_TIMEOUT = 5
+MICROCACHE_LOCK_TIMEOUT = 10
+MICROCACHE_LOCK_DIR = os.path.join(
+    tempfile.gettempdir(), 'yatube-microcache-locks'
+)
+MICROCACHE_VIEWS = [
+    'posts:main',
+    'posts:group',
+    'posts:profile',
+    'posts:post_detail',
+    'about:author',
+    'about:tech',
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -145,3 +233,48 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Keyset-пагинация лент (?after=/?before=) вместо номеров страниц
+POSTS_CURSOR_PAGINATION = False
+
+# Число постов главной ленты берётся из кеша. До POSTS_COUNT_SYNC_LIMIT
+# постов оно пересчитывается сразу после изменений, дальше — в фоне не
+# чаще раза в POSTS_COUNT_REFRESH_INTERVAL секунд.
+POSTS_COUNT_SYNC_LIMIT = 10000
+POSTS_COUNT_REFRESH_INTERVAL = 60
+
+# Бюджеты SQL-запросов объявлены в query_budgets модулей urls.py
+QUERY_BUDGET_ENABLED = DEBUG
+QUERY_BUDGET_STRICT = False
+QUERY_BUDGET_N_PLUS_ONE_THRESHOLD = 3
+
+# Предел подсчёта строк в списке постов админки при фильтрах и поиске:
+# дальше пагинатор не считает
+ADMIN_COUNT_LIMIT = 10000
+
+# Подписчиков, начиная с которого посты автора не раскладываются по
+# лентам подписок при записи, а подмешиваются при чтении.
+POSTS_FANOUT_MAX_FOLLOWERS = 1000
+# Сколько последних постов автора попадает в ленту при подписке
+POSTS_TIMELINE_BACKFILL = 100
+
+# Процессов для миниатюр картинок; 0 — делать миниатюры в самом запросе
+POSTS_THUMBNAIL_WORKERS = 2
+
+# Метрики для /metrics: каждый процесс пишет свой файл в METRICS_DIR не
+# чаще раза в METRICS_FLUSH_INTERVAL секунд, файлы завершившихся процессов
+# сливаются в общий. Смотреть метрики могут staff и METRICS_ALLOWED_IPS.
+METRICS_ENABLED = True
+METRICS_DIR = os.path.join(tempfile.gettempdir(), 'yatube-metrics')
+METRICS_FLUSH_INTERVAL = 1
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+
+# Профили cProfile: staff по X-Profile или ?_profile=1, остальные запросы
+# выборочно 1 из PROFILING_SAMPLE_RATE (0 — выключено).
+PROFILING_DIR = os.path.join(tempfile.gettempdir(), 'yatube-profiles')
+PROFILING_SAMPLE_RATE = 0
+PROFILING_MAX_FILES = 100
+
+# Журнал медленных SQL-запросов в админке (None — выключен)
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_MAX_ENTRIES = 10000
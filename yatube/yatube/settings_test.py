@@ -0,0 +1,26 @@
+"""Настройки тестов: manage.py test и pytest выбирают их сами."""
+import os
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+
+# Кеш в памяти процесса: тесты не видят страниц друг друга и сервера
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Загрузки и миниатюры тестов не попадают в media проекта
+MEDIA_ROOT = os.path.join(tempfile.gettempdir(), 'yatube-test-media')
+
+# Метрики тестов не смешиваются с метриками работающего сайта
+METRICS_DIR = os.path.join(tempfile.gettempdir(), 'yatube-test-metrics')
+
+# Блокировки микрокеша тестов не мешают работающему сайту
+MICROCACHE_LOCK_DIR = os.path.join(
+    tempfile.gettempdir(), 'yatube-test-microcache-locks'
+)
+
+# Превышение бюджета или N+1 роняет запрос, а с ним и тест
+QUERY_BUDGET_STRICT = True